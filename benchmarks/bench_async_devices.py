@@ -0,0 +1,102 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Benchmark: acquisition from many devices (asyncio engine vs one polling thread per device)
+#------------------------------------------------------------------------------------------------------------------
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import multiprocessing as mp
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from acquisition.phyphox_mock import MockPhyphoxServer
+from acquisition.phyphox_client import PhyphoxClient
+from acquisition.async_acquisition import AsyncAcquisition, AsyncDevice
+from acquisition.ring_buffer import RingBuffer
+
+# Function for serving n mock devices from a separate process (so they do not share the GIL with the
+# acquisition under test)
+def serve_mocks(n_devices, sample_rate, addresses, stop_event):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+    mocks = [MockPhyphoxServer(sample_rate=sample_rate, jitter=0.2).start() for i in range(n_devices)]
+    addresses.put([m.address for m in mocks])
+    stop_event.wait()
+    for m in mocks:
+        m.stop()
+
+# Function for acquiring from all the devices with the asyncio engine
+def run_async(addresses, duration, poll_interval):
+    devices = [AsyncDevice('device{}'.format(i), a) for i, a in enumerate(addresses)]
+    engine = AsyncAcquisition(devices, poll_interval)
+    cpu, start = time.process_time(), time.perf_counter()
+    engine.start_in_thread()
+    time.sleep(duration)
+    engine.stop()
+    elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu
+    return elapsed, cpu, sum(d.buffer.count for d in devices), sum(d.n_requests for d in devices)
+
+# Function for acquiring from all the devices with one polling thread per device
+def run_threads(addresses, duration, poll_interval):
+    stop_event = threading.Event()
+    clients = [PhyphoxClient(a) for a in addresses]
+    buffers = [RingBuffer(100000, c.n_channels) for c in clients]
+    counters = [0] * len(clients)
+
+    def fetch(i):
+        while not stop_event.is_set():
+            try:
+                buffers[i].extend(clients[i].fetch_new())
+                counters[i] += 1
+            except Exception:
+                pass
+            time.sleep(poll_interval)
+
+    threads = [threading.Thread(target=fetch, args=(i,), daemon=True) for i in range(len(clients))]
+    cpu, start = time.process_time(), time.perf_counter()
+    for th in threads:
+        th.start()
+    time.sleep(duration)
+    stop_event.set()
+    for th in threads:
+        th.join()
+    elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu
+    for c in clients:
+        c.close()
+    return elapsed, cpu, sum(b.count for b in buffers), sum(counters)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Device-count scaling of the acquisition engines against mock Phyphox servers')
+    parser.add_argument('--devices', type=int, nargs='+', default=[1, 2, 4, 8, 16], help='Numbers of devices to test')
+    parser.add_argument('--duration', type=float, default=3., help='Acquisition time in seconds for each test')
+    parser.add_argument('--sample-rate', type=float, default=200., help='Sample rate in Hz of each mock device')
+    parser.add_argument('--poll-interval', type=float, default=0.01, help='Time in seconds between requests to a device')
+    parser.add_argument('--output', help='JSON file for the results')
+    args = parser.parse_args()
+
+    results = []
+    print("{:>8} {:>8} {:>14} {:>12} {:>10}".format('mode', 'devices', 'samples/s/dev', 'requests/s', 'cpu (%)'))
+    for n in args.devices:
+        addresses, stop_event = mp.Queue(), mp.Event()
+        server = mp.Process(target=serve_mocks, args=(n, args.sample_rate, addresses, stop_event), daemon=True)
+        server.start()
+        device_addresses = addresses.get()
+
+        for mode, run in (('async', run_async), ('threads', run_threads)):
+            elapsed, cpu, n_samples, n_requests = run(device_addresses, args.duration, args.poll_interval)
+            result = {'mode': mode, 'devices': n, 'samples_per_s_per_device': n_samples / elapsed / n,
+                      'requests_per_s': n_requests / elapsed, 'cpu_percent': 100. * cpu / elapsed}
+            results.append(result)
+            print("{:>8} {:>8} {:>14.1f} {:>12.1f} {:>10.1f}".format(mode, n, result['samples_per_s_per_device'],
+                                                                     result['requests_per_s'], result['cpu_percent']))
+
+        stop_event.set()
+        server.join()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
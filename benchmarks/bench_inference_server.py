@@ -0,0 +1,106 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Benchmark: latency of the micro-batched inference server with many concurrent streams
+#------------------------------------------------------------------------------------------------------------------
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import http.client
+import multiprocessing as mp
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from online.linear_model import LinearModel
+from online.inference_server import InferenceServer
+
+# Function for running the server in a separate process (so it does not share the GIL with the clients)
+def serve(model_file, batch_interval, max_batch, addresses, stop_event):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+    server = InferenceServer(LinearModel.load(model_file), batch_interval=batch_interval, max_batch=max_batch).start()
+    addresses.put(server.address)
+    stop_event.wait()
+    server.stop()
+
+# Function for sending windows of one stream at a fixed rate and recording the latency of each request
+def run_client(address, stream, rate, duration, latencies, errors):
+    host, port = address.split(':')
+    connection = http.client.HTTPConnection(host, int(port), timeout=5)
+    rng = np.random.default_rng(abs(hash(stream)) % 2**32)
+    next_time = time.perf_counter() + rng.uniform(0, 1. / rate)
+    end_time = time.perf_counter() + duration
+    while next_time < end_time:
+        time.sleep(max(0., next_time - time.perf_counter()))
+        body = json.dumps({'window': rng.standard_normal((10, 6)).tolist()})
+        start = time.perf_counter()
+        try:
+            connection.request('POST', '/streams/{}/window'.format(stream), body, {'Content-Type': 'application/json'})
+            answer = json.loads(connection.getresponse().read())
+            if answer['label'] is None:
+                errors.append(stream)
+            latencies.append(time.perf_counter() - start)
+        except Exception:
+            errors.append(stream)
+            connection.close()
+        next_time += 1. / rate
+    connection.close()
+
+# Function for getting the statistics of the server
+def server_stats(address):
+    host, port = address.split(':')
+    connection = http.client.HTTPConnection(host, int(port), timeout=5)
+    connection.request('GET', '/stats')
+    stats = json.loads(connection.getresponse().read())
+    connection.close()
+    return stats
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Latency of the inference server against concurrent streams')
+    parser.add_argument('--model', default='linear_model.npz', help='Model file written by training/export_model.py')
+    parser.add_argument('--streams', type=int, nargs='+', default=[1, 8, 32, 64], help='Numbers of concurrent streams to test')
+    parser.add_argument('--rate', type=float, default=4., help='Windows per second sent by each stream')
+    parser.add_argument('--duration', type=float, default=5., help='Test time in seconds')
+    parser.add_argument('--batch-intervals', type=float, nargs='+', default=[0., 5.], help='Batch intervals in ms to compare (0 = no batching)')
+    parser.add_argument('--output', help='JSON file for the results')
+    args = parser.parse_args()
+
+    results = []
+    print("{:>10} {:>8} {:>12} {:>10} {:>10} {:>12} {:>7}".format('batch (ms)', 'streams', 'windows/s', 'p50 (ms)', 'p99 (ms)', 'mean batch', 'errors'))
+    for interval in args.batch_intervals:
+        for n in args.streams:
+            addresses, stop_event = mp.Queue(), mp.Event()
+            max_batch = 1 if interval == 0 else 256
+            server = mp.Process(target=serve, args=(args.model, interval / 1000., max_batch, addresses, stop_event), daemon=True)
+            server.start()
+            address = addresses.get()
+
+            latencies, errors = [], []
+            clients = [threading.Thread(target=run_client, args=(address, 'user{}'.format(i), args.rate, args.duration, latencies, errors))
+                       for i in range(n)]
+            start = time.perf_counter()
+            for th in clients:
+                th.start()
+            for th in clients:
+                th.join()
+            elapsed = time.perf_counter() - start
+            stats = server_stats(address)
+            stop_event.set()
+            server.join()
+
+            latencies = np.array(latencies) * 1000.
+            result = {'batch_interval_ms': interval, 'streams': n, 'windows_per_s': len(latencies) / elapsed,
+                      'latency_p50_ms': float(np.percentile(latencies, 50)), 'latency_p99_ms': float(np.percentile(latencies, 99)),
+                      'mean_batch_size': stats['mean_batch_size'], 'errors': len(errors)}
+            results.append(result)
+            print("{:>10g} {:>8} {:>12.1f} {:>10.2f} {:>10.2f} {:>12.2f} {:>7}".format(interval, n, result['windows_per_s'],
+                  result['latency_p50_ms'], result['latency_p99_ms'], result['mean_batch_size'], result['errors']))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
@@ -0,0 +1,198 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Benchmark suite: feature extraction, resampling, online latency and acquisition on synthetic sensor data
+#------------------------------------------------------------------------------------------------------------------
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+import multiprocessing as mp
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from acquisition.synthetic_sensors import ACTIVITIES, SyntheticActivity, synthetic_session, synthetic_windows
+from acquisition.phyphox_mock import MockPhyphoxServer
+from acquisition.phyphox_client import PhyphoxClient
+from acquisition.telemetry import StreamTelemetry
+from online.streaming import SlidingWindowFeatures
+from online.linear_model import LinearModel
+from processing.feature_cache import FeatureCache, recording_features
+from processing.features import extract_features
+from processing.recording import save_windows
+from processing.resampling import resample_windows
+
+CASES = ('features', 'resampling', 'online', 'acquisition')
+CHANNELS = ['accX', 'accY', 'accZ', 'gyroX', 'gyroY', 'gyroZ']
+
+# Function for timing a function: returns the minimum and the median time in ms of repeat calls
+def measure(func, repeat):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return 1000. * min(times), 1000. * float(np.median(times))
+
+# Function for describing the code and the machine of a run (results are only comparable between runs of
+# the same machine)
+def environment():
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {'commit': commit, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+            'numpy': np.__version__, 'machine': platform.machine(), 'system': platform.system(),
+            'cpu_count': os.cpu_count()}
+
+# Feature extraction of a recording as done by data_processing.py (load and extract on a cache miss, and
+# the cache hit)
+def bench_features(args):
+    data = synthetic_windows(args.trials, args.windows, seed=args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'synthetic.rec')
+        save_windows(path, data, CHANNELS, source='synthetic')
+        windows = np.stack([w for c, i, w in data])
+
+        cache = FeatureCache(os.path.join(tmp, 'cache'))
+        cache.features(path)
+        miss_min, miss_median = measure(lambda: recording_features(path), args.repeat)
+        extract_min, extract_median = measure(lambda: extract_features(windows), args.repeat)
+        extended_min, extended_median = measure(lambda: extract_features(windows, 'extended'), args.repeat)
+        hit_min, hit_median = measure(lambda: FeatureCache(os.path.join(tmp, 'cache')).features(path), args.repeat)
+
+    return {'windows': len(data), 'recording_ms': miss_median, 'recording_min_ms': miss_min,
+            'extract_ms': extract_median, 'extract_min_ms': extract_min,
+            'extract_extended_ms': extended_median, 'extract_extended_min_ms': extended_min,
+            'cache_hit_ms': hit_median, 'cache_hit_min_ms': hit_min,
+            'windows_per_s': len(data) / (extract_min / 1000.)}
+
+# Resampling of a raw session (jitter and duplicated timestamps) to the windows, as done at the end of
+# data_acquisition_new.py
+def bench_resampling(args):
+    trials = list(ACTIVITIES) * args.trials
+    t, x, t_starts, labels = synthetic_session(trials, args.windows, raw_rate=args.raw_rate, seed=args.seed)
+    n_samples = int(args.sampling_rate * args.window_time)
+    plain_min, plain_median = measure(lambda: resample_windows(t, x, t_starts, args.window_time, n_samples), args.repeat)
+    aa_min, aa_median = measure(lambda: resample_windows(t, x, t_starts, args.window_time, n_samples, antialias=True), args.repeat)
+    return {'raw_samples': len(t), 'windows': len(t_starts), 'resample_ms': plain_median, 'resample_min_ms': plain_min,
+            'antialias_ms': aa_median, 'antialias_min_ms': aa_min,
+            'raw_samples_per_s': len(t) / (plain_min / 1000.)}
+
+# Online classification of a raw session replayed in polling blocks: time from the arrival of a block to
+# its label (engine update, selected features and prediction), as in online_prototype.py
+def bench_online(args):
+    from training.export_model import train_model
+
+    data = synthetic_windows(args.trials, args.windows, seed=args.seed + 1)
+    features = np.nan_to_num(extract_features(np.stack([w for c, i, w in data])))
+    clf, arrays = train_model(features, np.array([i for c, i, w in data], dtype='float64'), n_features=10)
+    arrays.pop('version')
+    model = LinearModel(**arrays)
+
+    trials = list(ACTIVITIES) * args.trials
+    t, x, t_starts, labels = synthetic_session(trials, args.windows, raw_rate=args.raw_rate, seed=args.seed)
+    block_ends = np.searchsorted(t, np.arange(t[0], t[-1] + args.block_time, args.block_time), side='right')
+    engine = SlidingWindowFeatures(x.shape[1], args.sampling_rate, args.window_time)
+    latencies, start_index = [], 0
+    for end in block_ends:
+        if end <= start_index:
+            continue
+        start = time.perf_counter()
+        engine.push(t[start_index:end], x[start_index:end])
+        if engine.ready():
+            model.predict(engine.selected_features(model.selected))
+            latencies.append(time.perf_counter() - start)
+        start_index = end
+
+    latencies = 1000. * np.array(latencies)
+    return {'labels': len(latencies), 'block_ms': 1000. * args.block_time,
+            'latency_p50_ms': float(np.percentile(latencies, 50)), 'latency_p99_ms': float(np.percentile(latencies, 99)),
+            'latency_max_ms': float(np.max(latencies)), 'labels_per_s': len(latencies) / (np.sum(latencies) / 1000.)}
+
+# Function for serving a mock device with the signal of an activity from a separate process (so it does not
+# share the GIL with the client under test)
+def serve_mock(activity, sample_rate, overlap, seed, addresses, stop_event):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+    mock = MockPhyphoxServer(sample_rate=sample_rate, jitter=0.3, signal=SyntheticActivity(activity, seed),
+                             seed=seed, overlap=overlap).start()
+    addresses.put(mock.address)
+    stop_event.wait()
+    mock.stop()
+
+# Acquisition throughput against a mock Phyphox server (polling client, as data_acquisition_new.py)
+def bench_acquisition(args):
+    addresses, stop_event = mp.Queue(), mp.Event()
+    server = mp.Process(target=serve_mock, args=('Run', args.raw_rate, args.overlap, args.seed, addresses, stop_event), daemon=True)
+    server.start()
+    telemetry = StreamTelemetry('mock', nominal_rate=args.raw_rate)
+    client = PhyphoxClient(addresses.get(), timeout=1, telemetry=telemetry)
+
+    n_samples = 0
+    cpu, start = time.process_time(), time.perf_counter()
+    while time.perf_counter() - start < args.duration:
+        n_samples += len(client.fetch_new())
+        time.sleep(args.poll_interval)
+    elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu
+    client.close()
+    stop_event.set()
+    server.join()
+
+    s = telemetry.snapshot()
+    return {'samples_per_s': n_samples / elapsed, 'requests_per_s': s['requests'] / elapsed,
+            'rtt_p50_ms': 1000. * s['rtt']['p50'], 'rtt_p99_ms': 1000. * s['rtt']['p99'],
+            'duplicate_ratio': s['duplicate_ratio'], 'gaps': s['gaps'], 'errors': s['errors'],
+            'cpu_percent': 100. * cpu / elapsed}
+
+# Function for printing the change of every metric with respect to a previous results file
+def compare(results, baseline):
+    print("\nChange with respect to {} ({}):".format(baseline['environment']['commit'], baseline['environment']['time']))
+    print("{:<12} {:<20} {:>12} {:>12} {:>9}".format('case', 'metric', 'before', 'after', 'change'))
+    for case, metrics in results.items():
+        for name, value in metrics.items():
+            before = baseline['results'].get(case, {}).get(name)
+            if not isinstance(value, (int, float)) or not isinstance(before, (int, float)):
+                continue
+            change = '{:+.1%}'.format(value / before - 1.) if before else '-'
+            print("{:<12} {:<20} {:>12.4g} {:>12.4g} {:>9}".format(case, name, before, value, change))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Reproducible benchmarks of the processing pipeline on synthetic sensor data')
+    parser.add_argument('--cases', nargs='+', choices=CASES, default=list(CASES), help='Benchmarks to run')
+    parser.add_argument('--trials', type=int, default=4, help='Trials per activity in the synthetic sessions')
+    parser.add_argument('--windows', type=int, default=30, help='Windows per trial')
+    parser.add_argument('--raw-rate', type=float, default=100., help='Sample rate in Hz of the synthetic sensors')
+    parser.add_argument('--sampling-rate', type=int, default=20, help='Sampling rate in Hz of the windows')
+    parser.add_argument('--window-time', type=float, default=0.5, help='Window length in seconds')
+    parser.add_argument('--block-time', type=float, default=0.25, help='Time in seconds of the raw blocks replayed online')
+    parser.add_argument('--duration', type=float, default=3., help='Acquisition time in seconds')
+    parser.add_argument('--poll-interval', type=float, default=0.01, help='Time in seconds between requests to the mock')
+    parser.add_argument('--overlap', type=float, default=0.05, help='Time in seconds of samples sent again by the mock (duplicates)')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetitions of each timed function')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic data')
+    parser.add_argument('--output', help='JSON file for the results')
+    parser.add_argument('--compare', help='Previous results file to compare with')
+    args = parser.parse_args()
+
+    benchmarks = {'features': bench_features, 'resampling': bench_resampling, 'online': bench_online,
+                  'acquisition': bench_acquisition}
+    results = {}
+    for case in args.cases:
+        results[case] = benchmarks[case](args)
+        print("{}: {}".format(case, ', '.join('{} {:.4g}'.format(k, v) for k, v in results[case].items())))
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment(), 'args': vars(args), 'results': results}, f, indent=2)
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
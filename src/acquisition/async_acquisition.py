@@ -0,0 +1,216 @@
+#------------------------------------------------------------------------------------------------------------------
+#   asyncio acquisition engine for polling several mobile devices from one process
+#------------------------------------------------------------------------------------------------------------------
+import asyncio
+import json
+import threading
+import time
+
+from acquisition.phyphox_client import PhyphoxStream
+from acquisition.ring_buffer import RingBuffer
+
+# Timeout and retry policy for the requests sent to a device
+class RetryPolicy:
+
+    def __init__(self, timeout=0.5, max_retries=3, backoff=0.05, max_backoff=1.):
+        self.timeout = timeout                  # Timeout in seconds of each request
+        self.max_retries = max_retries          # Retries of a failed request before it is counted as an error
+        self.backoff = backoff                  # Delay in seconds before the first retry (doubled every retry)
+        self.max_backoff = max_backoff          # Maximum delay in seconds between retries
+
+    # Function for getting the delay before the given retry (starting at 0)
+    def delay(self, retry):
+        return min(self.max_backoff, self.backoff * 2**retry)
+
+# Minimal keep-alive HTTP/1.1 connection built on asyncio streams (only GET requests with JSON answers)
+class AsyncHTTPConnection:
+
+    def __init__(self, address):
+        host, _, port = address.partition(':')
+        self.host = host
+        self.port = int(port) if port else 80
+        self.reader = None
+        self.writer = None
+
+    # Function for sending a GET request and returning the decoded JSON answer
+    async def get_json(self, path):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        request = 'GET {} HTTP/1.1\r\nHost: {}\r\nConnection: keep-alive\r\n\r\n'.format(path, self.host)
+        self.writer.write(request.encode())
+        await self.writer.drain()
+
+        # Status line and headers
+        status = (await self.reader.readline()).decode().split()
+        if len(status) < 2:
+            raise ConnectionError('Connection closed by {}:{}'.format(self.host, self.port))
+        headers = {}
+        while True:
+            line = (await self.reader.readline()).decode().strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        # Body
+        if 'content-length' in headers:
+            body = await self.reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = b''
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                body += chunk[:-2]
+        else:
+            body = await self.reader.read()
+            headers['connection'] = 'close'
+
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        if int(status[1]) != 200:
+            raise ConnectionError('HTTP error {} from {}:{}'.format(status[1], self.host, self.port))
+        return json.loads(body)
+
+    # Function for closing the connection
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+        self.reader = None
+        self.writer = None
+
+# Device polled by the asyncio engine.
+# New samples are written to the device ring buffer (the event loop thread is its only writer). If
+# queue_size is given, the blocks of new samples are also put in a bounded asyncio queue for a consumer;
+# when the consumer falls behind the queue fills up and the device is not polled until there is room again
+# (backpressure). No data is lost in the meantime, because the next incremental request returns every
+# sample buffered by the phone. The same applies to an optional StreamWriter that saves the samples to disk.
+# Requests, retries and samples are reported to an optional StreamTelemetry, with the fill of the queue and
+# of the writer queue as buffer probes. An error that is not a failed request (e.g. the writer cannot save
+# the samples) stops the polling of this device only; it is kept in failed.
+class AsyncDevice:
+
+    def __init__(self, name, address, sensors=('acc', 'gyro'), buffer_capacity=100000, queue_size=None, writer=None,
+                 telemetry=None):
+        self.name = name
+        self.address = address
+        self.stream = PhyphoxStream(sensors, telemetry)
+        self.connection = AsyncHTTPConnection(address)
+        self.buffer = RingBuffer(buffer_capacity, self.stream.n_channels)
+        self.queue = asyncio.Queue(queue_size) if queue_size else None
+        self.writer = writer
+        self.telemetry = telemetry
+        if telemetry is not None:
+            if self.queue is not None:
+                telemetry.add_probe('queue', lambda: (self.queue.qsize(), self.queue.maxsize))
+            if writer is not None:
+                telemetry.add_probe('writer', writer.fill)
+
+        self.n_requests = 0         # Number of successful requests
+        self.n_retries = 0          # Number of retried requests
+        self.n_errors = 0           # Number of requests that failed after all the retries
+        self.last_error = None
+        self.failed = None          # Error that stopped the polling of the device
+
+    # Function for fetching the new samples of the device with the given retry policy
+    async def poll(self, retry):
+        for attempt in range(retry.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                data = await asyncio.wait_for(self.connection.get_json(self.stream.next_path()), retry.timeout)
+                if self.telemetry is not None:
+                    self.telemetry.request(time.perf_counter() - start)
+                rows = self.stream.merge(data['buffer'])
+                self.n_requests += 1
+                break
+            except Exception as e:
+                await self.connection.close()       # The connection may be in an unknown state
+                self.last_error = e
+                if self.telemetry is not None:
+                    self.telemetry.error(e, retried=attempt < retry.max_retries)
+                if attempt == retry.max_retries:
+                    self.n_errors += 1
+                    return
+                self.n_retries += 1
+                await asyncio.sleep(retry.delay(attempt))
+
+        if len(rows):
+            self.buffer.extend(rows)
+            if self.writer is not None and not self.writer.try_put(rows):
+                await asyncio.to_thread(self.writer.put, rows)      # Wait for the writer without blocking other devices
+            if self.queue is not None:
+                await self.queue.put(rows)
+
+# asyncio acquisition engine.
+# Polls all the devices concurrently from a single event loop, every poll_interval seconds each.
+class AsyncAcquisition:
+
+    def __init__(self, devices, poll_interval=0.01, retry=None):
+        self.devices = devices
+        self.poll_interval = poll_interval
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.loop = None
+        self.thread = None
+        self.stop_event = None
+
+    # Function for polling one device until the engine is stopped or the device fails (the other devices
+    # keep being polled)
+    async def poll_device(self, device):
+        try:
+            while not self.stop_event.is_set():
+                start = time.perf_counter()
+                await device.poll(self.retry)
+                elapsed = time.perf_counter() - start
+                await asyncio.sleep(max(0., self.poll_interval - elapsed))
+        except Exception as e:
+            device.failed = e
+            if device.telemetry is not None:
+                device.telemetry.error(e)
+            print("{}: polling stopped ({}: {})".format(device.name, type(e).__name__, e))
+        finally:
+            await device.connection.close()
+
+    # Function for running the engine in the current event loop until stop() is called
+    async def run(self):
+        self.stop_event = asyncio.Event()
+        await asyncio.gather(*(self.poll_device(d) for d in self.devices))
+
+    # Function for running the engine in a background thread with its own event loop
+    def start_in_thread(self):
+        started = threading.Event()
+
+        def main():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            task = self.loop.create_task(self.run())
+            self.loop.call_soon(started.set)
+            try:
+                self.loop.run_until_complete(task)
+            finally:
+                self.loop.close()
+
+        self.thread = threading.Thread(target=main, daemon=True)
+        self.thread.start()
+        started.wait()
+        return self
+
+    # Function for stopping the engine (from any thread)
+    def stop(self):
+        if self.loop is not None and self.thread is not None:
+            try:
+                self.loop.call_soon_threadsafe(self.stop_event.set)
+            except RuntimeError:
+                pass                    # Loop already closed (every device failed)
+            self.thread.join()
+        elif self.stop_event is not None:
+            self.stop_event.set()
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
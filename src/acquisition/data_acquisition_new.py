@@ -1,16 +1,22 @@
 #------------------------------------------------------------------------------------------------------------------
 #   Mobile sensor data acquisition example
 #------------------------------------------------------------------------------------------------------------------
+import os
+import sys
 import time
-import requests
 import numpy as np
 import threading
 
 import random
-import pickle
 from datetime import datetime
 
-from scipy.interpolate import interp1d
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from acquisition.phyphox_client import PhyphoxClient
+from acquisition.async_acquisition import AsyncAcquisition, AsyncDevice, RetryPolicy
+from acquisition.stream_writer import StreamWriter
+from acquisition.telemetry import StreamTelemetry, TelemetryReporter
+from processing.recording import Recording, save_windows
+from processing.resampling import resample_windows
 
 # Experiment configuration
 conditions = [('Nothing', 1), ('Jump', 2), ('Run', 3),('Walk', 4), ('Squat', 5), ('JumpingJack', 6)]  # List of conditions with their IDs
@@ -25,6 +31,8 @@ rest_time = 1               # Time in seconds for rest between trials
 sampling_rate = 20          # Sampling rate in Hz of the output data
 max_samp_rate = 5000        # Maximum possible sampling rate
 max_window_samples = int(window_time*max_samp_rate)     # Maximum number of samples in each window
+antialias = False           # Low-pass filter the raw data before resampling it to sampling_rate
+sample_dtype = 'float64'    # Storage of the windows: 'float64', 'float32' or 'int16' (scaled per channel); raw data is float32 unless float64
 
 trials = n_trials*conditions
 random.shuffle(trials)
@@ -33,57 +41,95 @@ trial_time = fixation_cross_time + preparation_time + n_windows*window_time + re
 
 # Communication parameters
 IP_ADDRESS = '10.43.98.215'
-COMMAND = 'accX&accY&accZ&acc_time&gyroX&gyroY&gyroZ&gyro_time'
-BASE_URL = "http://{}/get?{}".format(IP_ADDRESS, COMMAND)
+DEVICES = {'subject1': IP_ADDRESS}      # Devices recorded at the same time in async mode (name: address)
+acquisition_mode = 'thread'             # 'thread' (one polling thread for IP_ADDRESS) or 'async' (all DEVICES from one event loop)
+poll_interval = 0.01        # Time in seconds between requests (each request returns all the new samples)
+telemetry_interval = 5      # Time in seconds between telemetry summaries (also saved to <timestamp>_telemetry.json)
+
+# Raw data is streamed to disk during the experiment (one recording per device), so the complete
+# session is never held in memory
+n_signals = 6   # Number of signals (accX, accY, accZ, gyroX, gyroY, gyroZ)
+channels = ['accX', 'accY', 'accZ', 'gyroX', 'gyroY', 'gyroZ']
+block_size = 4096           # Number of samples written to disk at once
+live_buffer_size = int(2 * window_time * max_samp_rate)     # Samples kept in memory by the async engine
 
-# Data buffer
-n_signals = 6   # Number of signals (accX, accY, accZ)
-buffer_size = int(2 * len(trials)*trial_time * max_samp_rate)       # Buffer size  (2 times the number of samples in the complete experiment)
+now = datetime.now().strftime("%m_%d_%Y_%H_%M_%S")
+names = list(DEVICES) if acquisition_mode == 'async' else ['subject1']
+file_names = {name: now if len(names) == 1 else now + '_' + name for name in names}
+writers = {}
+for name in names:
+    raw_dtype = 'float64' if sample_dtype == 'float64' else 'float32'     # The time channel cannot be quantized
+    raw = Recording.create(file_names[name] + '_raw.rec', ['time'] + channels, raw_dtype, conditions=dict((c[1], c[0]) for c in conditions))
+    writers[name] = StreamWriter(raw, block_size, source=name)
 
-buffer = np.zeros((buffer_size, n_signals + 1), dtype='float64')    # Buffer for storing data (channel 0 is time)
-buffer_index = 0                                                    # Index for the next data point to be written
+# Telemetry of each device (request latency, sampling rate, duplicates, gaps, errors and writer queue fill)
+telemetry = {name: StreamTelemetry(name) for name in names}
 
 # Flag for stopping the data acquisition
 stop_recording_flag = threading.Event()
 
-# Mutex for thread-safe access to the buffer
-buffer_lock = threading.Lock()
+if acquisition_mode == 'async':
+
+    # One event loop polls every device concurrently, each one with its own writer
+    devices = [AsyncDevice(name, address, sensors=('acc', 'gyro'), buffer_capacity=live_buffer_size, writer=writers[name], telemetry=telemetry[name]) for name, address in DEVICES.items()]
+    engine = AsyncAcquisition(devices, poll_interval, RetryPolicy(timeout=0.5, max_retries=3))
+
+else:
+
+    client = PhyphoxClient(IP_ADDRESS, sensors=('acc', 'gyro'), timeout=0.5, telemetry=telemetry['subject1'])
+    telemetry['subject1'].add_probe('writer', writers['subject1'].fill)
 
-# Function for continuously fetching data from the mobile device
+# Function for continuously fetching data from the mobile device. Failed requests are retried on the next
+# poll; if the samples cannot be saved (e.g. the disk is full) acquisition stops, because every sample
+# received afterwards would be lost.
 def fetch_data():    
-    sleep_time = 1. / max_samp_rate 
+    writer = writers['subject1']
     while not stop_recording_flag.is_set():
         try:
-            response = requests.get(BASE_URL, timeout=0.5)
-            response.raise_for_status()            
-            data = response.json()
-
-            global buffer, buffer_index    
-            
-            with buffer_lock:  # Ensure thread-safe access to the buffer
-                buffer[buffer_index:, 0] = data["buffer"]["acc_time"]["buffer"][0]    
-                buffer[buffer_index:, 1] = data["buffer"]["accX"]["buffer"][0]
-                buffer[buffer_index:, 2] = data["buffer"]["accY"]["buffer"][0]
-                buffer[buffer_index:, 3] = data["buffer"]["accZ"]["buffer"][0]
-                buffer[buffer_index:, 4] = data["buffer"]["gyroX"]["buffer"][0]
-                buffer[buffer_index:, 5] = data["buffer"]["gyroY"]["buffer"][0]
-                buffer[buffer_index:, 6] = data["buffer"]["gyroZ"]["buffer"][0]
-
-                buffer_index += 1
-            
+            rows = client.fetch_new()
+        except Exception:
+            rows = []   # Counted by the client telemetry (number, type and last error are in the periodic summary)
+
+        try:
+            # The writer queue is bounded: if the disk falls behind, this waits instead of dropping samples
+            writer.put(rows)
         except Exception as e:
-            print(f"Error fetching data: {e}")
+            telemetry['subject1'].error(e)
+            print("Error saving data, acquisition stopped: {}".format(writer.error or e))
+            return
+
+        time.sleep(poll_interval)
 
-        time.sleep(sleep_time)
+# Function for checking whether acquisition failed (a writer stopped, a device in async mode, or the
+# fetching thread in thread mode)
+def acquisition_failed():
+    if any(writer.error is not None for writer in writers.values()):
+        return True
+    if acquisition_mode == 'async':
+        return any(d.failed is not None for d in devices)
+    return not recording_thread.is_alive()
 
 # Function for stopping the data acquisition
 def stop_recording():
-    stop_recording_flag.set()
-    recording_thread.join()
+    if acquisition_mode == 'async':
+        engine.stop()
+        for d in devices:
+            print("{}: {} requests, {} retries, {} errors".format(d.name, d.n_requests, d.n_retries, d.n_errors))
+    else:
+        stop_recording_flag.set()
+        recording_thread.join()
+        client.close()
+    reporter.stop()
+    for writer in writers.values():
+        writer.close()      # Raises the error of a writer that failed
     
 # Start data acquisition
-recording_thread = threading.Thread(target=fetch_data, daemon=True)
-recording_thread.start()
+reporter = TelemetryReporter(telemetry.values(), telemetry_interval, path=now + '_telemetry.json').start()
+if acquisition_mode == 'async':
+    engine.start_in_thread()
+else:
+    recording_thread = threading.Thread(target=fetch_data, daemon=True)
+    recording_thread.start()
 
 # Run experiment
 print ("********* Experiment in progress *********")    
@@ -92,6 +138,9 @@ time.sleep(fixation_cross_time)
 window_info = []
 count  = 0
 for t in trials:
+    if acquisition_failed():
+        print ("\n********* Acquisition failed, experiment stopped *********")
+        break
 
     # Fixation cross    
     count = count + 1;
@@ -104,9 +153,10 @@ for t in trials:
 
     # Task
     for window in range(n_windows):                
+        if acquisition_failed():
+            break
         time.sleep(window_time)
-        #with buffer_lock:  # Ensure thread-safe access to the buffer
-        window_info.append((t[0], t[1], buffer_index))  
+        window_info.append((t[0], t[1], {name: w.count for name, w in writers.items()}))  
 
     # Rest time    
     print ("----Rest----")
@@ -115,45 +165,36 @@ for t in trials:
 # Stop data acquisition
 stop_recording()
 
-# Calculate average sampling rate
-t = buffer[:buffer_index, 0]    # Time data
-diff_t = np.diff(t)             # Time differences
-
-print("Min sampling rate: {:.2f} Hz".format(1. / np.max(diff_t)))
-print("Max sampling rate: {:.2f} Hz".format(1. / np.min(diff_t)))
-print("Average sampling rate: {:.2f} Hz".format(1. / np.mean(diff_t)))
-
-# Interpolation functions for uniform sampling
-interp_x1 = interp1d(t, buffer[:buffer_index, 1], kind='linear', fill_value="extrapolate") # Interpolation function for acceleration X
-interp_x2 = interp1d(t, buffer[:buffer_index, 2], kind='linear', fill_value="extrapolate") # Interpolation function for acceleration Y
-interp_x3 = interp1d(t, buffer[:buffer_index, 3], kind='linear', fill_value="extrapolate") # Interpolation function for acceleration Z
-interp_x4 = interp1d(t, buffer[:buffer_index, 4], kind='linear', fill_value="extrapolate") # Interpolation function for gyroscope X
-interp_x5 = interp1d(t, buffer[:buffer_index, 5], kind='linear', fill_value="extrapolate") # Interpolation function for gyroscope Y
-interp_x6 = interp1d(t, buffer[:buffer_index, 6], kind='linear', fill_value="extrapolate") # Interpolation function for gyroscope Z
-
-# Separate the data for each trial
-window_samples = int(sampling_rate * window_time)  # Number of samples in each window
-data = []
-for w in window_info:
-    condition = w[0]        # Condition name
-    condition_id = w[1]     # Condition ID
-    start_index =  w[2]     # Start index of the window in the buffer
-
-    # Calculate the uniform time vector for the window
-    t_start = buffer[start_index, 0]    # Start time of the window
-    t_uniform = np.linspace(t_start, t_start + window_time, int(window_time * sampling_rate))    
-
-    # Interpolate the signals for the uniform time vector
-    signal_data = np.column_stack((interp_x1(t_uniform), interp_x2(t_uniform), interp_x3(t_uniform), interp_x4(t_uniform), interp_x5(t_uniform), interp_x6(t_uniform)))       
-    
-    # Append the data for this window
-    data.append((condition, condition_id, signal_data))
+for name, writer in writers.items():
 
-# Save data
-now = datetime.now().strftime("%m_%d_%Y_%H_%M_%S")
-outputFile = open(now + '.obj', 'wb')
-pickle.dump(data, outputFile)
-outputFile.close()
+    # Recorded samples (memory-mapped from the raw recording; window_info holds offsets in it)
+    raw = writer.recording
+    recorded = raw.session_samples(writer.session)
+    session_start = raw.header['sessions'][writer.session]['samples'][0]
+    if len(writers) > 1:
+        print("\n********* {} *********".format(name))
+
+    # Calculate average sampling rate
+    t = recorded[:, 0]              # Time data
+    diff_t = np.diff(t)             # Time differences
+
+    print("Min sampling rate: {:.2f} Hz".format(1. / np.max(diff_t)))
+    print("Max sampling rate: {:.2f} Hz".format(1. / np.min(diff_t)))
+    print("Average sampling rate: {:.2f} Hz".format(1. / np.mean(diff_t)))
+
+    # Separate the data for each trial: all the windows are resampled at once (one interpolation pass
+    # shared by the six signals, repeated timestamps removed)
+    window_samples = int(sampling_rate * window_time)  # Number of samples in each window
+    start_indices = np.array([w[2][name] for w in window_info]) - session_start    # Start index of each window in the samples of the device
+    t_starts = t[np.minimum(start_indices, len(t) - 1)]                             # Start time of each window
+    windows = resample_windows(t, recorded[:, 1:], t_starts, window_time, window_samples, antialias=antialias)
+    data = [(w[0], w[1], signal_data) for w, signal_data in zip(window_info, windows)]
+
+    # Save data (one recording per device): resampled windows, and the ranges of the windows in the raw samples
+    save_windows(file_names[name] + '.rec', data, channels, source=name, dtype=sample_dtype)
+
+    window_stops = session_start + np.searchsorted(t, t_starts + window_time, side='right')
+    raw.append_windows(np.column_stack((session_start + start_indices, window_stops)), [w[1] for w in window_info])
 
 #------------------------------------------------------------------------------------------------------------------
 #   End of file
@@ -0,0 +1,167 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Polling client for the Phyphox remote access server
+#------------------------------------------------------------------------------------------------------------------
+import threading
+import time
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+# Buffers of each sensor in the Phyphox experiments used in this project
+SENSOR_BUFFERS = {'acc': ('accX', 'accY', 'accZ'), 'gyro': ('gyroX', 'gyroY', 'gyroZ')}
+
+# Incremental Phyphox stream.
+# Keeps the time of the last sample received from each sensor, builds the requests that use the incremental
+# syntax of Phyphox (get?accX=<last_time>|acc_time&...) and merges their answers into rows with all the
+# sensors aligned to the time base of the first one: each row is (time, accX, accY, accZ, gyroX, gyroY, gyroZ)
+# for the default sensors. It does no I/O, so it is shared by the blocking and the asyncio clients.
+# If a StreamTelemetry is given, the received and new timestamps of the first sensor are reported to it.
+class PhyphoxStream:
+
+    def __init__(self, sensors=('acc', 'gyro'), telemetry=None):
+        self.sensors = sensors
+        self.n_channels = 1 + 3*len(sensors)
+        self.telemetry = telemetry
+
+        self.last_time = {s: None for s in sensors}     # Time of the last sample received from each sensor
+        self.history = {s: None for s in sensors[1:]}   # Recent samples of secondary sensors (for alignment)
+        self.merge_lock = threading.Lock()
+
+    # Function for building the path of a request. since is None for the last value of each buffer, or a
+    # dictionary with the time of the last sample received from each sensor.
+    def path(self, since=None):
+        args = []
+        for s in self.sensors:
+            names = SENSOR_BUFFERS[s] + (s + '_time',)
+            if since is None or since[s] is None:
+                args += names
+            else:
+                threshold = repr(float(since[s]))
+                args += ['{}={}%7C{}_time'.format(n, threshold, s) for n in names[:-1]]
+                args.append('{}={}'.format(names[-1], threshold))
+        return '/get?' + '&'.join(args)
+
+    # Function for getting the path of the next incremental request
+    def next_path(self):
+        with self.merge_lock:
+            return self.path(dict(self.last_time))
+
+    # Function for keeping only the samples that are newer than the ones already received (responses of
+    # concurrent requests overlap) and aligning all the sensors to the time base of the first one
+    def merge(self, data):
+        samples = {}
+        for s in self.sensors:
+            t = np.asarray(data[s + '_time']['buffer'], dtype='float64')
+            x = np.column_stack([np.asarray(data[n]['buffer'], dtype='float64') for n in SENSOR_BUFFERS[s]]) \
+                if len(t) else np.zeros((0, 3))
+            n = min(len(t), len(x))
+            t, x = t[:n], x[:n]
+            if self.last_time[s] is not None:
+                keep = t > self.last_time[s]
+                t, x = t[keep], x[keep]
+            if len(t):
+                self.last_time[s] = t[-1]
+            samples[s] = (t, x)
+            if self.telemetry is not None and s == self.sensors[0]:
+                self.telemetry.samples(n, t)
+
+        t_base = samples[self.sensors[0]][0]
+        rows = np.zeros((len(t_base), self.n_channels))
+        rows[:, 0] = t_base
+        rows[:, 1:4] = samples[self.sensors[0]][1]
+        for i, s in enumerate(self.sensors[1:]):
+            t, x = samples[s]
+            if self.history[s] is not None:
+                t = np.concatenate((self.history[s][0], t))
+                x = np.vstack((self.history[s][1], x))
+            if len(t) == 0:
+                continue
+
+            # Interpolate on the time base (values are held at the ends)
+            cols = slice(4 + 3*i, 7 + 3*i)
+            rows[:, cols] = np.column_stack([np.interp(t_base, t, x[:, k]) for k in range(3)])
+
+            # Keep the last sample before the end of the time base and everything after it
+            if self.last_time[self.sensors[0]] is not None:
+                first = max(0, np.searchsorted(t, self.last_time[self.sensors[0]], side='right') - 1)
+                t, x = t[first:], x[first:]
+            self.history[s] = (t, x)
+
+        return rows
+
+# Phyphox polling client.
+# All requests go through one requests.Session, so TCP connections are kept alive and reused. fetch_new()
+# returns every sample buffered by the device since the previous request (see PhyphoxStream).
+class PhyphoxClient(PhyphoxStream):
+
+    def __init__(self, address, sensors=('acc', 'gyro'), timeout=0.5, inflight=1, telemetry=None):
+        super().__init__(sensors, telemetry)
+        self.address = address
+        self.timeout = timeout
+        self.inflight = inflight                # Number of concurrent requests used by start()
+
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=max(1, inflight)))
+
+    # Function for building the URL of a request (see PhyphoxStream.path())
+    def url(self, since=None):
+        return 'http://{}{}'.format(self.address, self.path(since))
+
+    # Function for sending a request and decoding the answer
+    def get(self, url):
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()['buffer']
+
+    # Function for fetching the last value of each buffer with a single request (one row)
+    def fetch_latest(self):
+        data = self.get(self.url())
+        row = [data[self.sensors[0] + '_time']['buffer'][0]]
+        for s in self.sensors:
+            row += [data[n]['buffer'][0] for n in SENSOR_BUFFERS[s]]
+        return np.array(row, dtype='float64')
+
+    # Function for fetching all the samples received by the device since the previous call. If given,
+    # callback(rows) is called with the new samples before another response can be merged. Errors of the
+    # request, of the merge and of the callback are reported to the telemetry.
+    def fetch_new(self, callback=None):
+        start = time.perf_counter()
+        try:
+            data = self.get('http://{}{}'.format(self.address, self.next_path()))
+            if self.telemetry is not None:
+                self.telemetry.request(time.perf_counter() - start)
+            with self.merge_lock:
+                rows = self.merge(data)
+                if callback is not None and len(rows):
+                    callback(rows)
+        except Exception as e:
+            if self.telemetry is not None:
+                self.telemetry.error(e)
+            raise
+        return rows
+
+    # Function for polling the device continuously from inflight threads until stop_event is set.
+    # callback(rows) is called with every block of new samples, one call at a time and in order.
+    def start(self, callback, stop_event, interval=0.01, on_error=None):
+        def poll():
+            while not stop_event.is_set():
+                try:
+                    self.fetch_new(callback)
+                except Exception as e:
+                    if on_error is not None:
+                        on_error(e)
+                stop_event.wait(interval)
+
+        threads = [threading.Thread(target=poll, daemon=True) for i in range(self.inflight)]
+        for th in threads:
+            th.start()
+        return threads
+
+    # Function for closing the connections
+    def close(self):
+        self.session.close()
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
@@ -0,0 +1,154 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Local stand-in for the Phyphox remote access server (/get endpoint)
+#------------------------------------------------------------------------------------------------------------------
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+
+import numpy as np
+
+from acquisition.phyphox_client import SENSOR_BUFFERS
+
+# Function for generating default sensor signals (gravity on accZ plus slow oscillations)
+def default_signal(sensor, t):
+    phase = 0. if sensor == 'acc' else 0.5
+    x = np.column_stack((np.sin(2*np.pi*1.*t + phase), np.cos(2*np.pi*0.5*t + phase), 0.2*np.sin(2*np.pi*3.*t)))
+    if sensor == 'acc':
+        x[:, 2] += 9.81
+    return x
+
+# Mock Phyphox server.
+# Samples of each sensor are generated as the wall clock advances (at sample_rate Hz, with optional timing
+# jitter), and requests are answered with the same JSON layout and query syntax as the Phyphox app:
+#   get?accX&acc_time                       -> last value of each buffer
+#   get?accX=full&acc_time=full             -> complete buffers
+#   get?accX=12.3|acc_time&acc_time=12.3    -> values whose acc_time is greater than 12.3
+# With overlap > 0, incremental answers also repeat the samples of the last overlap seconds (duplicated
+# timestamps, as the ones of overlapping requests).
+class MockPhyphoxServer:
+
+    def __init__(self, sample_rate=100., jitter=0., signal=default_signal, sensors=('acc', 'gyro'),
+                 host='127.0.0.1', port=0, seed=None, overlap=0.):
+        self.sample_rate = sample_rate
+        self.jitter = jitter                    # Amplitude of the timestamp jitter (fraction of the sampling period)
+        self.overlap = overlap                  # Time in seconds of samples sent again in incremental answers (duplicates)
+        self.signal = signal
+        self.sensors = sensors
+        self.rng = np.random.default_rng(seed)
+
+        self.times = {s: np.zeros(0) for s in sensors}
+        self.values = {s: np.zeros((0, 3)) for s in sensors}
+        self.data_lock = threading.Lock()
+        self.start_time = None
+
+        self.n_requests = 0                     # Number of requests served
+        self.n_connections = 0                  # Number of TCP connections accepted
+
+        self.server = ThreadingHTTPServer((host, port), self.make_handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def address(self):
+        host, port = self.server.server_address[:2]
+        return '{}:{}'.format(host, port)
+
+    # Function for starting the server in a background thread
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    # Function for stopping the server
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    # Function for generating the samples up to the current time
+    def update(self):
+        now = time.perf_counter() - self.start_time
+        for s in self.sensors:
+            n_total = int(now * self.sample_rate) + 1
+            n_new = n_total - len(self.times[s])
+            if n_new <= 0:
+                continue
+            t = np.arange(len(self.times[s]), n_total) / self.sample_rate
+            if self.jitter > 0:
+                t += self.jitter / self.sample_rate * self.rng.uniform(-0.5, 0.5, n_new)
+            self.times[s] = np.concatenate((self.times[s], t))
+            self.values[s] = np.vstack((self.values[s], self.signal(s, t)))
+
+    # Function for building the JSON answer of a request
+    def answer(self, query):
+        with self.data_lock:
+            self.update()
+            response = {}
+            for name, arg in parse_qsl(query, keep_blank_values=True):
+                sensor, column = self.lookup(name)
+                if sensor is None:
+                    continue
+                t = self.times[sensor]
+                data = t if column is None else self.values[sensor][:, column]
+                if arg == '':
+                    selected, mode = data[-1:], 'single'
+                elif arg == 'full':
+                    selected, mode = data, 'full'
+                else:
+                    threshold = float(arg.split('|')[0])
+                    selected, mode = data[t > threshold - self.overlap], 'partial'
+                response[name] = {'size': 0, 'updateMode': mode, 'buffer': selected.tolist()}
+        return {'buffer': response, 'status': {'session': 'mock', 'measuring': True, 'timedRun': False, 'countDown': 0}}
+
+    # Function for finding the sensor and the column of a buffer name
+    def lookup(self, name):
+        for s in self.sensors:
+            if name == s + '_time':
+                return s, None
+            if name in SENSOR_BUFFERS[s]:
+                return s, SENSOR_BUFFERS[s].index(name)
+        return None, None
+
+    # Function for building the request handler bound to this server
+    def make_handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'       # Keep-alive connections
+            disable_nagle_algorithm = True      # Headers and body are separate writes (no delayed-ACK stall)
+
+            def setup(self):
+                super().setup()
+                mock.n_connections += 1
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path != '/get':
+                    self.send_error(404)
+                    return
+                mock.n_requests += 1
+                body = json.dumps(mock.answer(url.query)).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
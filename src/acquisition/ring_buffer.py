@@ -0,0 +1,93 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Single-producer ring buffer for sensor samples
+#------------------------------------------------------------------------------------------------------------------
+import numpy as np
+
+# Ring buffer with O(1) appends and zero-copy reads.
+# There must be a single writer thread. Instead of a mutex, the buffer keeps a sequence counter with the
+# total number of samples written, which is published only after the samples are stored. Readers take the
+# counter, get views of the rows they need (one slice, or two when the range wraps around the end of the
+# array) and can check afterwards with overwritten() whether the writer lapped them while they were reading.
+class RingBuffer:
+
+    def __init__(self, capacity, n_channels, dtype='float64'):
+        self.capacity = int(capacity)
+        self.n_channels = n_channels
+        self.data = np.zeros((self.capacity, n_channels), dtype=dtype)
+        self.count = 0          # Sequence counter (total number of samples written)
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    # Function for writing one sample (producer thread only)
+    def append(self, sample):
+        self.data[self.count % self.capacity] = sample
+        self.count += 1
+
+    # Function for writing a block of samples with at most two slice assignments (producer thread only)
+    def extend(self, samples):
+        samples = np.asarray(samples)
+        n = len(samples)
+        if n == 0:
+            return
+        if n > self.capacity:
+            self.count += n - self.capacity
+            samples = samples[-self.capacity:]
+            n = self.capacity
+        start = self.count % self.capacity
+        first = min(n, self.capacity - start)
+        self.data[start:start + first] = samples[:first]
+        self.data[:n - first] = samples[first:]
+        self.count += n
+
+    # Function for getting the views of the samples with sequence numbers in [start_seq, end_seq)
+    def segments(self, start_seq, end_seq):
+        start_seq = max(start_seq, end_seq - self.capacity, 0)
+        if end_seq <= start_seq:
+            return [self.data[:0]]
+        start = start_seq % self.capacity
+        stop = start + (end_seq - start_seq)
+        if stop <= self.capacity:
+            return [self.data[start:stop]]
+        return [self.data[start:], self.data[:stop - self.capacity]]
+
+    # Function for getting the last n samples (list of one or two views in chronological order)
+    def last(self, n):
+        end_seq = self.count
+        return self.segments(end_seq - n, end_seq)
+
+    # Function for getting the samples written after sequence number seq. Returns the views and the
+    # sequence number to be used in the next call.
+    def since(self, seq):
+        end_seq = self.count
+        return self.segments(seq, end_seq), end_seq
+
+    # Function for getting the samples of the last given seconds (list of one or two views in
+    # chronological order). Timestamps must be increasing.
+    def last_seconds(self, seconds, time_channel=0):
+        end_seq = self.count
+        views = self.segments(0, end_seq)
+        if end_seq == 0:
+            return views
+        t_min = views[-1][-1, time_channel] - seconds
+        result = []
+        for v in views:
+            start = np.searchsorted(v[:, time_channel], t_min, side='left')
+            if start < len(v):
+                result.append(v[start:])
+        return result
+
+    # Function that indicates whether the samples starting at sequence number seq have been overwritten
+    def overwritten(self, seq):
+        return self.count - seq > self.capacity
+
+    # Function for joining the views returned by the read functions (copies only when there are two)
+    @staticmethod
+    def join(views):
+        if len(views) == 1:
+            return views[0]
+        return np.concatenate(views)
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
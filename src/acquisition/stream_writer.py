@@ -0,0 +1,109 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Background writer that streams raw samples to a recording
+#------------------------------------------------------------------------------------------------------------------
+import queue
+import threading
+
+import numpy as np
+
+# Streaming raw-sample writer.
+# The fetch thread hands blocks of new samples to put(); a bounded queue carries them to a background
+# thread that gathers them into fixed-size blocks and appends each full block to the recording. When the
+# writer falls behind, the queue fills up and put() blocks the fetch thread instead of dropping samples
+# (the phone keeps buffering them and the next incremental request returns them). If the writer thread
+# fails (e.g. the disk is full), put() and close() raise its error instead of waiting for it.
+# count is the number of samples accepted so far, i.e. the offset in the recording of the next sample, so
+# it can be used directly as a window boundary.
+class StreamWriter:
+
+    def __init__(self, recording, block_size=4096, queue_size=64, source=None, conditions=None):
+        self.recording = recording
+        self.block_size = block_size
+        self.queue = queue.Queue(queue_size)
+        self.session = recording.begin_session(source, conditions)
+        self.count = recording.n_samples            # Offset of the next sample accepted by put()
+
+        self.block = np.empty((block_size, len(recording.channels)),
+                              dtype=recording.dtype if recording.scales is None else 'float64')    # Quantized on append
+        self.block_fill = 0
+        self.n_blocks = 0                           # Number of blocks written
+        self.n_waits = 0                            # Number of times put() had to wait for the writer
+        self.error = None
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    # Function for handing new samples (array of shape (n, n_channels)) to the writer
+    def put(self, rows):
+        if len(rows) == 0:
+            return
+        if self.error is not None:
+            raise self.error
+        if not self.try_put(rows):
+            self.n_waits += 1
+            self.wait_put(rows)
+            self.count += len(rows)
+
+    # Function for handing new samples to the writer without waiting. Returns False if the queue is full.
+    def try_put(self, rows):
+        if self.error is not None:
+            raise self.error
+        try:
+            self.queue.put_nowait(rows)
+        except queue.Full:
+            return False
+        self.count += len(rows)
+        return True
+
+    # Function for putting an item in the queue, waiting for room only while the writer thread is working
+    # (nothing drains the queue once it has failed)
+    def wait_put(self, item, poll_time=0.1):
+        while True:
+            if self.error is not None:
+                raise self.error
+            try:
+                self.queue.put(item, timeout=poll_time)
+                return
+            except queue.Full:
+                pass
+
+    # Function for getting the fill of the queue as (used, capacity) (buffer probe for the telemetry)
+    def fill(self):
+        return self.queue.qsize(), self.queue.maxsize
+
+    # Writer thread
+    def run(self):
+        try:
+            while True:
+                rows = self.queue.get()
+                if rows is None:
+                    break
+                while len(rows):
+                    n = min(len(rows), self.block_size - self.block_fill)
+                    self.block[self.block_fill:self.block_fill + n] = rows[:n]
+                    self.block_fill += n
+                    rows = rows[n:]
+                    if self.block_fill == self.block_size:
+                        self.flush()
+            self.flush()
+        except Exception as e:
+            self.error = e
+
+    # Function for appending the current block to the recording
+    def flush(self):
+        if self.block_fill:
+            self.recording.append_samples(self.block[:self.block_fill])
+            self.block_fill = 0
+            self.n_blocks += 1
+
+    # Function for writing the remaining samples and stopping the writer thread
+    def close(self):
+        if self.thread.is_alive():
+            self.wait_put(None)
+            self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
@@ -0,0 +1,115 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Synthetic accelerometer and gyroscope data for each activity (benchmarks and tests without a phone)
+#------------------------------------------------------------------------------------------------------------------
+import numpy as np
+
+from processing.resampling import resample_windows
+
+# Model of each activity: condition ID, movement frequency (Hz), amplitude of the acceleration (m/s^2) and of
+# the angular velocity (rad/s) on each axis, amplitude of the impact peaks (landings and steps, mostly on the
+# vertical axis Z) and standard deviation of the sensor noise (acc, gyro)
+ACTIVITIES = {
+    'Nothing':     {'id': 1, 'freq': 0.2, 'acc': (0.02, 0.02, 0.02), 'gyro': (0.01, 0.01, 0.01), 'impact': 0., 'noise': (0.03, 0.01)},
+    'Jump':        {'id': 2, 'freq': 1.0, 'acc': (0.5, 0.5, 4.), 'gyro': (0.3, 0.3, 0.2), 'impact': 15., 'noise': (0.3, 0.05)},
+    'Run':         {'id': 3, 'freq': 2.8, 'acc': (2., 1.5, 6.), 'gyro': (1.5, 1., 0.8), 'impact': 8., 'noise': (0.5, 0.1)},
+    'Walk':        {'id': 4, 'freq': 1.9, 'acc': (1., 0.8, 2.), 'gyro': (0.8, 0.5, 0.4), 'impact': 1.5, 'noise': (0.2, 0.05)},
+    'Squat':       {'id': 5, 'freq': 0.4, 'acc': (0.3, 0.3, 2.5), 'gyro': (0.6, 0.1, 0.1), 'impact': 0., 'noise': (0.1, 0.03)},
+    'JumpingJack': {'id': 6, 'freq': 1.3, 'acc': (5., 1., 6.), 'gyro': (0.5, 2.5, 0.5), 'impact': 10., 'noise': (0.4, 0.1)},
+}
+
+GRAVITY = 9.81
+
+# Synthetic signal of one activity.
+# Each axis is a sinusoid at the movement frequency plus its second harmonic, with random phases, and the
+# acceleration adds gravity on Z and a short peak once per cycle (impacts). The frequency of each instance
+# varies by up to freq_variation (fraction) around the one of the model, so different seeds behave like
+# different subjects. Instances are callable as signal(sensor, t), the signal of MockPhyphoxServer.
+class SyntheticActivity:
+
+    def __init__(self, activity, seed=None, freq_variation=0.1):
+        self.activity = activity
+        self.model = ACTIVITIES[activity]
+        self.rng = np.random.default_rng(seed)
+        self.freq = self.model['freq'] * (1. + self.rng.uniform(-freq_variation, freq_variation))
+        self.phases = {s: self.rng.uniform(0, 2*np.pi, (2, 3)) for s in ('acc', 'gyro')}
+        self.impact_width = 0.04                # Width of the impact peaks (fraction of a cycle)
+
+    # Function for generating the samples of a sensor ('acc' or 'gyro') at times t. Returns shape (n, 3).
+    def __call__(self, sensor, t):
+        t = np.asarray(t, dtype='float64')[:, np.newaxis]
+        amplitude = np.asarray(self.model[sensor])
+        phases = self.phases[sensor]
+        w = 2*np.pi*self.freq
+        x = amplitude * (np.sin(w*t + phases[0]) + 0.3*np.sin(2*w*t + phases[1]))
+        noise = self.model['noise'][0 if sensor == 'acc' else 1]
+        x += noise * self.rng.standard_normal(x.shape)
+
+        if sensor == 'acc':
+            x[:, 2] += GRAVITY
+            if self.model['impact'] > 0:
+                cycle = (self.freq * t[:, 0]) % 1.
+                peak = self.model['impact'] * np.exp(-0.5 * ((cycle - 0.5) / self.impact_width)**2)
+                x[:, 2] += peak
+                x[:, 0] += 0.2 * peak
+        return x
+
+    # Function for generating the samples of both sensors at times t. Returns shape (n, 6).
+    def samples(self, t):
+        return np.hstack((self('acc', t), self('gyro', t)))
+
+# Function for generating sample times at rate Hz with timing jitter (fraction of the sampling period), as
+# the ones of the phone sensors
+def sample_times(n, rate, jitter=0., rng=None, t0=0.):
+    t = t0 + np.arange(n) / rate
+    if jitter > 0:
+        rng = rng if rng is not None else np.random.default_rng()
+        t += jitter / rate * rng.uniform(-0.5, 0.5, n)
+    return t
+
+# Function for repeating a fraction of the samples (the same sample received again by overlapping requests,
+# as in raw recordings). Repeated samples follow the original one.
+def add_duplicates(t, x, ratio, rng=None):
+    if ratio <= 0 or len(t) == 0:
+        return t, x
+    rng = rng if rng is not None else np.random.default_rng()
+    counts = np.ones(len(t), dtype='int64')
+    np.add.at(counts, rng.integers(0, len(t), int(round(ratio * len(t)))), 1)
+    return np.repeat(t, counts), np.repeat(x, counts, axis=0)
+
+# Function for generating a raw session like the ones recorded by data_acquisition_new.py: for each trial,
+# rest_time seconds without movement followed by n_windows windows of the activity.
+#   trials: activity names, in order
+#   Returns the time vector (n,), the samples (n, 6) with jitter and duplicated timestamps, the start time
+#   of each window and its (condition, condition ID).
+def synthetic_session(trials, n_windows=30, window_time=0.5, rest_time=1., raw_rate=100., jitter=0.3,
+                      duplicate_ratio=0.05, seed=0):
+    rng = np.random.default_rng(seed)
+    t_parts, x_parts, t_starts, labels = [], [], [], []
+    t0 = 0.
+    for activity in trials:
+        for name, duration in (('Nothing', rest_time), (activity, n_windows * window_time)):
+            n = int(round(duration * raw_rate))
+            t = sample_times(n, raw_rate, jitter, rng, t0)
+            t_parts.append(t)
+            x_parts.append(SyntheticActivity(name, seed=rng.integers(2**32)).samples(t))
+            t0 += n / raw_rate
+        start = t_parts[-1][0]
+        t_starts += [start + k * window_time for k in range(n_windows)]
+        labels += [(activity, ACTIVITIES[activity]['id'])] * n_windows
+
+    t, x = add_duplicates(np.concatenate(t_parts), np.vstack(x_parts), duplicate_ratio, rng)
+    return t, x, np.array(t_starts), labels
+
+# Function for generating resampled windows in the layout of the recordings (list of (condition,
+# condition_id, window) tuples, see processing.recording.load_windows). Every activity is recorded in
+# n_trials trials.
+def synthetic_windows(n_trials=2, n_windows=30, sampling_rate=20, window_time=0.5, seed=0, **kwargs):
+    trials = list(ACTIVITIES) * n_trials
+    np.random.default_rng(seed).shuffle(trials)
+    t, x, t_starts, labels = synthetic_session(trials, n_windows, window_time, seed=seed, **kwargs)
+    windows = resample_windows(t, x, t_starts, window_time, int(sampling_rate * window_time))
+    return [(c, i, w) for (c, i), w in zip(labels, windows)]
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
@@ -0,0 +1,235 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Acquisition telemetry: request latency, sample rate, duplicates, gaps, buffer fill and label latency
+#------------------------------------------------------------------------------------------------------------------
+import json
+import os
+import threading
+import time
+from bisect import bisect_right
+
+import numpy as np
+
+# Bin edges in seconds of the latency histograms (log spaced from 0.1 ms to 10 s)
+LATENCY_EDGES = tuple(np.logspace(-4, 1, 51))
+
+# Histogram with fixed bins (constant memory, O(log bins) per value). Percentiles are the upper edge of the
+# bin where they fall.
+class Histogram:
+
+    def __init__(self, edges=LATENCY_EDGES):
+        self.edges = edges
+        self.counts = [0] * (len(edges) + 1)
+        self.n = 0
+        self.total = 0.
+        self.max = 0.
+
+    def add(self, value):
+        self.counts[bisect_right(self.edges, value)] += 1
+        self.n += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q):
+        if self.n == 0:
+            return None
+        cumulative = np.cumsum(self.counts)
+        i = int(np.searchsorted(cumulative, q / 100. * self.n))
+        return self.edges[i] if i < len(self.edges) else self.max
+
+    def summary(self):
+        if self.n == 0:
+            return {'count': 0}
+        return {'count': self.n, 'mean': self.total / self.n, 'p50': self.percentile(50),
+                'p90': self.percentile(90), 'p99': self.percentile(99), 'max': self.max}
+
+    def to_dict(self):
+        return dict(self.summary(), edges=list(self.edges), counts=list(self.counts))
+
+# Telemetry of one stream (device).
+# The acquisition code reports each request (round-trip time or error) and each block of received samples;
+# from the sample timestamps it keeps the effective sampling rate, the interval jitter, the ratio of
+# duplicated timestamps (samples received again by overlapping requests) and the gaps, i.e. intervals
+# longer than gap_factor sampling periods, with an estimate of the samples lost in them. Buffers are
+# observed through probes (functions returning (used, capacity)) sampled on every request. The clock offset
+# between the phone and this computer is estimated from the earliest arrivals, so the latency of a label
+# can be measured from the time its last sample was taken.
+class StreamTelemetry:
+
+    def __init__(self, name, nominal_rate=None, gap_factor=3.):
+        self.name = name
+        self.period = 1. / nominal_rate if nominal_rate else None     # Expected sampling period
+        self.gap_factor = gap_factor
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+
+        self.rtt = Histogram()                  # Request round-trip times
+        self.label_latency = Histogram()        # Time from the last sample of a window to its label
+        self.n_requests = 0
+        self.n_errors = 0
+        self.n_retries = 0
+        self.errors = {}                        # Number of errors of each type
+        self.last_error = None
+
+        self.n_received = 0                     # Samples received (including duplicates)
+        self.n_samples = 0                      # New samples
+        self.n_duplicates = 0
+        self.n_gaps = 0
+        self.n_dropped = 0                      # Estimated samples missing in the gaps
+        self.first_time = None                  # First and last sample times (phone clock)
+        self.last_time = None
+        self.dt_sums = np.zeros(3)              # Number, sum and sum of squares of the sampling intervals
+        self.clock_offset = None                # Minimum of (arrival time - sample time)
+
+        self.probes = {}
+        self.fill = {}                          # Last and maximum fill of each buffer
+        self.n_labels = 0
+
+    # Function for registering a buffer probe: a function returning (used, capacity)
+    def add_probe(self, name, probe):
+        self.probes[name] = probe
+
+    def sample_probes(self):
+        for name, probe in self.probes.items():
+            used, capacity = probe()
+            level = used / capacity if capacity else 0.
+            last, peak = self.fill.get(name, (0., 0.))
+            self.fill[name] = (level, max(peak, level))
+
+    # Function for reporting a successful request
+    def request(self, rtt):
+        with self.lock:
+            self.n_requests += 1
+            self.rtt.add(rtt)
+            self.sample_probes()
+
+    # Function for reporting a failed request (retried=True if it is going to be retried)
+    def error(self, e, retried=False):
+        with self.lock:
+            if retried:
+                self.n_retries += 1
+            else:
+                self.n_errors += 1
+            name = type(e).__name__
+            self.errors[name] = self.errors.get(name, 0) + 1
+            self.last_error = '{}: {}'.format(name, e)
+
+    # Function for reporting the samples of a response: n_received timestamps were received, of which t are
+    # new (increasing sample times)
+    def samples(self, n_received, t):
+        arrival = time.perf_counter()
+        with self.lock:
+            self.n_received += n_received
+            self.n_duplicates += n_received - len(t)
+            if len(t) == 0:
+                return
+            self.n_samples += len(t)
+
+            offset = arrival - t[-1]
+            self.clock_offset = offset if self.clock_offset is None else min(self.clock_offset, offset)
+
+            dt = np.diff(t) if self.last_time is None else np.diff(np.concatenate(([self.last_time], t)))
+            if self.first_time is None:
+                self.first_time = t[0]
+            self.last_time = t[-1]
+            if len(dt) == 0:
+                return
+            self.dt_sums += (len(dt), np.sum(dt), np.sum(dt**2))
+
+            # Gaps, measured against the nominal period or the median interval seen so far
+            period = self.period if self.period else self.dt_sums[1] / self.dt_sums[0]
+            if self.period is None and len(dt) >= 5:
+                period = float(np.median(dt))
+            gaps = dt[dt > self.gap_factor * period]
+            self.n_gaps += len(gaps)
+            self.n_dropped += int(np.sum(np.round(gaps / period) - 1))
+
+    # Function for reporting a label. t_sample is the time (phone clock) of the last sample of the window.
+    def label(self, t_sample):
+        with self.lock:
+            if self.clock_offset is None:
+                return
+            self.n_labels += 1
+            self.label_latency.add(max(0., time.perf_counter() - self.clock_offset - t_sample))
+
+    # Function for getting the derived metrics (JSON serializable)
+    def snapshot(self, histograms=False):
+        with self.lock:
+            self.sample_probes()
+            n_dt, sum_dt, sum_dt2 = self.dt_sums
+            span = (self.last_time - self.first_time) if self.n_samples > 1 else 0.
+            snapshot = {'name': self.name, 'elapsed': time.perf_counter() - self.start,
+                        'requests': self.n_requests, 'errors': self.n_errors, 'retries': self.n_retries,
+                        'error_types': dict(self.errors), 'last_error': self.last_error,
+                        'samples': self.n_samples,
+                        'sample_rate': (self.n_samples - 1) / span if span > 0 else None,
+                        'interval_jitter': float(np.sqrt(max(0., sum_dt2 / n_dt - (sum_dt / n_dt)**2))) if n_dt else None,
+                        'duplicate_ratio': self.n_duplicates / self.n_received if self.n_received else 0.,
+                        'gaps': self.n_gaps, 'dropped': self.n_dropped,
+                        'buffer_fill': {k: {'last': v[0], 'max': v[1]} for k, v in self.fill.items()},
+                        'labels': self.n_labels}
+            if histograms:
+                snapshot['rtt'] = self.rtt.to_dict()
+                snapshot['label_latency'] = self.label_latency.to_dict()
+            else:
+                snapshot['rtt'] = self.rtt.summary()
+                snapshot['label_latency'] = self.label_latency.summary()
+        return snapshot
+
+    # Function for building a one-line summary
+    def summary_line(self):
+        s = self.snapshot()
+        ms = lambda v: '-' if v is None else '{:.1f}'.format(1000. * v)
+        line = '{}: {:.1f} Hz, {} req, rtt p50/p99 {}/{} ms, dup {:.0%}, {} gaps ({} dropped), {} errors'.format(
+            s['name'], s['sample_rate'] or 0., s['requests'], ms(s['rtt'].get('p50')), ms(s['rtt'].get('p99')),
+            s['duplicate_ratio'], s['gaps'], s['dropped'], s['errors'])
+        for k, v in s['buffer_fill'].items():
+            line += ', {} {:.0%} (max {:.0%})'.format(k, v['last'], v['max'])
+        if s['labels']:
+            line += ', label latency p50/p99 {}/{} ms'.format(ms(s['label_latency']['p50']), ms(s['label_latency']['p99']))
+        return line
+
+# Periodic reporter: prints the summary of every stream and writes the full metrics (with histograms) to a
+# JSON file every interval seconds, and once more when it is stopped
+class TelemetryReporter:
+
+    def __init__(self, streams, interval=5., path=None, verbose=True):
+        self.streams = list(streams)
+        self.interval = interval
+        self.path = path
+        self.verbose = verbose
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.report()
+
+    # Function for printing the summaries and writing the JSON file
+    def report(self):
+        if self.verbose:
+            for s in self.streams:
+                print("[telemetry] " + s.summary_line())
+        if self.path:
+            self.dump(self.path)
+
+    # Function for writing the metrics of all the streams to a JSON file
+    def dump(self, path):
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'time': time.time(), 'streams': [s.snapshot(histograms=True) for s in self.streams]}, f, indent=1)
+        os.replace(tmp, path)
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.report()
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
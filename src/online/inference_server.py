@@ -0,0 +1,276 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Micro-batched inference server for many concurrent streams (local REST endpoint)
+#------------------------------------------------------------------------------------------------------------------
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from processing.features import extract_selected_features
+from online.linear_model import LinearModel
+from online.streaming import SlidingWindowFeatures
+
+# Window waiting to be classified (the handler thread waits on done until the batcher sets the label)
+class PendingWindow:
+
+    def __init__(self, stream, window, moments=None):
+        self.stream = stream
+        self.window = window
+        self.moments = moments                  # (mean, m2, m3, m4) of the engine for pushed samples
+        self.arrival = time.perf_counter()
+        self.done = threading.Event()
+        self.label = None
+
+# Per-stream state: the sliding-window engine used for raw-sample pushes and the last prediction
+class StreamState:
+
+    def __init__(self, n_axes, sampling_rate, window_time):
+        self.engine = SlidingWindowFeatures(n_axes, sampling_rate, window_time)
+        self.lock = threading.Lock()
+        self.label = None
+        self.n_windows = 0
+
+# Inference server.
+# Clients push either complete windows or raw samples of their stream:
+#   POST /streams/<id>/window    {"window": [[accX, accY, accZ, gyroX, gyroY, gyroZ], ...]}
+#   POST /streams/<id>/samples   {"t": [...], "x": [[accX, ..., gyroZ], ...]}   (resampled per stream)
+#   GET  /streams/<id>           last prediction of the stream
+#   GET  /stats                  batch sizes and latency percentiles
+# Windows from all the streams are collected for batch_interval seconds after the first one arrives (or
+# until max_batch are pending) and then classified together: the selected features of the whole batch
+# are one extract_selected_features() call and the classification one matrix product. Windows built from
+# raw samples are classified with the moments kept up to date by the engine of their stream.
+class InferenceServer:
+
+    def __init__(self, model, host='127.0.0.1', port=0, batch_interval=0.005, max_batch=256,
+                 sampling_rate=20, window_time=0.5, n_axes=6, timeout=1.):
+        model.check_sampling_rate(sampling_rate)
+        self.model = model
+        self.batch_interval = batch_interval
+        self.max_batch = max_batch
+        self.sampling_rate = sampling_rate
+        self.window_time = window_time
+        self.n_axes = n_axes
+        self.timeout = timeout                  # Maximum time a request waits for its prediction
+
+        self.pending = []
+        self.pending_lock = threading.Condition()
+        self.streams = {}
+        self.streams_lock = threading.Lock()
+        self.running = False
+
+        self.n_windows = 0                      # Number of windows classified
+        self.n_batches = 0                      # Number of batches
+        self.latencies = deque(maxlen=10000)    # Time from arrival to prediction of the last windows
+        self.batch_sizes = deque(maxlen=10000)
+
+        self.server = ThreadingHTTPServer((host, port), self.make_handler())
+        self.server.daemon_threads = True
+        self.threads = []
+
+    @property
+    def address(self):
+        host, port = self.server.server_address[:2]
+        return '{}:{}'.format(host, port)
+
+    # Function for starting the batcher and the HTTP server in background threads
+    def start(self):
+        self.running = True
+        self.threads = [threading.Thread(target=self.run_batches, daemon=True),
+                        threading.Thread(target=self.server.serve_forever, daemon=True)]
+        for th in self.threads:
+            th.start()
+        return self
+
+    # Function for stopping the server
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        with self.pending_lock:
+            self.running = False
+            self.pending_lock.notify()
+        for th in self.threads:
+            th.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    # Function for getting (or creating) the state of a stream
+    def stream(self, name):
+        with self.streams_lock:
+            if name not in self.streams:
+                self.streams[name] = StreamState(self.n_axes, self.sampling_rate, self.window_time)
+            return self.streams[name]
+
+    # Function for classifying a window (array of shape (n_samples, n_axes)) in the next batch. Waits for
+    # the batch and returns the label (None on timeout).
+    def classify(self, stream, window, moments=None):
+        item = PendingWindow(stream, window, moments)
+        with self.pending_lock:
+            self.pending.append(item)
+            self.pending_lock.notify()
+        item.done.wait(self.timeout)
+        return item.label
+
+    # Function for pushing raw samples of a stream. Returns the label of the current window, or None if the
+    # stream does not have a complete window yet.
+    def push_samples(self, stream, t, x):
+        state = self.stream(stream)
+        with state.lock:
+            state.engine.push(t, x)
+            if not state.engine.ready():
+                return None
+            window = state.engine.window_data()
+            moments = state.engine.moments()
+        return self.classify(stream, window, moments)
+
+    # Batcher thread
+    def run_batches(self):
+        while True:
+            with self.pending_lock:
+                while self.running and not self.pending:
+                    self.pending_lock.wait()
+                if not self.running:
+                    break
+
+                # Wait until the oldest window has waited batch_interval or the batch is full
+                deadline = self.pending[0].arrival + self.batch_interval
+                while self.running and len(self.pending) < self.max_batch and time.perf_counter() < deadline:
+                    self.pending_lock.wait(deadline - time.perf_counter())
+                batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+
+            self.predict_batch(batch)
+
+    # Function for classifying a batch of pending windows (windows of different lengths, and windows with
+    # and without engine moments, are grouped)
+    def predict_batch(self, batch):
+        groups = {}
+        for item in batch:
+            groups.setdefault((item.window.shape, item.moments is None), []).append(item)
+        for (shape, no_moments), items in groups.items():
+            try:
+                moments = None if no_moments else [np.stack(m) for m in zip(*(item.moments for item in items))]
+                features = extract_selected_features(np.stack([item.window for item in items]), self.model.selected,
+                                                     self.sampling_rate, moments)
+                labels = self.model.predict(features)
+            except Exception as e:
+                print("Error classifying batch: {}".format(e))
+                labels = [None] * len(items)
+            now = time.perf_counter()
+            for item, label in zip(items, labels):
+                item.label = None if label is None else label.item()
+                state = self.stream(item.stream)
+                state.label = item.label
+                state.n_windows += 1
+                self.latencies.append(now - item.arrival)
+                item.done.set()
+        self.n_windows += len(batch)
+        self.n_batches += 1
+        self.batch_sizes.append(len(batch))
+
+    # Function for building the statistics answered by GET /stats
+    def stats(self):
+        latencies = np.array(self.latencies) * 1000.
+        stats = {'streams': len(self.streams), 'windows': self.n_windows, 'batches': self.n_batches,
+                 'mean_batch_size': float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.}
+        if len(latencies):
+            stats.update({'latency_p50_ms': float(np.percentile(latencies, 50)),
+                          'latency_p99_ms': float(np.percentile(latencies, 99)),
+                          'latency_max_ms': float(np.max(latencies))})
+        return stats
+
+    # Function for building the JSON answer of a prediction
+    def prediction(self, stream, label):
+        name = None if label is None else self.model.class_name(label)
+        return {'stream': stream, 'label': label, 'name': name}
+
+    # Function for building the request handler bound to this server
+    def make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'       # Keep-alive connections
+            disable_nagle_algorithm = True      # Headers and body are separate writes (no delayed-ACK stall)
+
+            def do_GET(self):
+                parts = urlsplit(self.path).path.strip('/').split('/')
+                if parts == ['stats']:
+                    self.send_json(server.stats())
+                elif len(parts) == 2 and parts[0] == 'streams':
+                    state = server.streams.get(parts[1])
+                    if state is None:
+                        self.send_json({'error': 'unknown stream'}, 404)
+                    else:
+                        self.send_json(server.prediction(parts[1], state.label))
+                else:
+                    self.send_json({'error': 'not found'}, 404)
+
+            def do_POST(self):
+                parts = urlsplit(self.path).path.strip('/').split('/')
+                if len(parts) != 3 or parts[0] != 'streams' or parts[2] not in ('window', 'samples'):
+                    self.send_json({'error': 'not found'}, 404)
+                    return
+                try:
+                    body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                    if parts[2] == 'window':
+                        window = np.asarray(body['window'], dtype='float64')
+                        if window.ndim != 2 or window.shape[1] != server.n_axes:
+                            raise ValueError('window must have shape (n_samples, {})'.format(server.n_axes))
+                        label = server.classify(parts[1], window)
+                    else:
+                        x = np.asarray(body['x'], dtype='float64').reshape(-1, server.n_axes)
+                        label = server.push_samples(parts[1], np.asarray(body['t'], dtype='float64'), x)
+                except (ValueError, KeyError, TypeError) as e:
+                    self.send_json({'error': str(e)}, 400)
+                    return
+                self.send_json(server.prediction(parts[1], label))
+
+            def send_json(self, data, status=200):
+                body = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Micro-batched activity classification server')
+    parser.add_argument('--model', default='linear_model.npz', help='Model file written by training/export_model.py')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on')
+    parser.add_argument('--batch-interval', type=float, default=5., help='Maximum time in ms a window waits for its batch')
+    parser.add_argument('--max-batch', type=int, default=256, help='Maximum number of windows per batch')
+    parser.add_argument('--sampling-rate', type=float, default=20, help='Sampling rate in Hz of the windows built from raw samples')
+    parser.add_argument('--window-time', type=float, default=0.5, help='Window size in seconds')
+    args = parser.parse_args()
+
+    server = InferenceServer(LinearModel.load(args.model), args.host, args.port, args.batch_interval / 1000.,
+                             args.max_batch, args.sampling_rate, args.window_time)
+    server.start()
+    print("Serving on http://{}".format(server.address))
+    try:
+        while True:
+            time.sleep(10)
+            print(server.stats())
+    except KeyboardInterrupt:
+        server.stop()
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
@@ -0,0 +1,88 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Runtime predictor for exported linear models (no scikit-learn needed)
+#------------------------------------------------------------------------------------------------------------------
+import numpy as np
+
+from processing.features import FEATURE_SETS, extract_selected_features
+
+# Version of the model files written by training/export_model.py
+MODEL_VERSION = 1
+
+# Linear classifier exported from a trained scikit-learn pipeline (scaler + feature selection + linear SVC).
+# The model file (.npz) holds plain arrays:
+#   selected        columns of the full feature matrix used by the model
+#   mean, scale     standardization of the selected features
+#   coef, intercept decision function of each pair of classes (one-vs-one, as in SVC)
+#   pairs           class indices (i, j) of each decision function (positive values vote for i)
+#   classes         class labels, class_names their names
+#   sampling_rate   sampling rate in Hz of the training windows, feature_set their feature set (the spectral
+#                   features depend on the sampling rate; older files without them are assumed to be 20 Hz)
+# The scaler is folded into the weights when the model is loaded, so a prediction is the features of the
+# selected columns, a single matrix-vector product and a vote.
+class LinearModel:
+
+    def __init__(self, selected, mean, scale, coef, intercept, pairs, classes, class_names=None, sampling_rate=None,
+                 feature_set=None):
+        self.selected = np.asarray(selected, dtype='int64')
+        self.sampling_rate = float(sampling_rate) if sampling_rate is not None else None
+        self.feature_set = str(feature_set) if feature_set is not None else None
+        if self.feature_set is not None and self.feature_set not in FEATURE_SETS:
+            raise ValueError('Unsupported feature set {}'.format(self.feature_set))
+        self.classes = np.asarray(classes)
+        self.class_names = list(class_names) if class_names is not None else [str(c) for c in self.classes]
+        self.pairs = np.asarray(pairs, dtype='int64')
+
+        # Scaled decision function w @ ((x - mean) / scale) + b written as w' @ x + b'
+        coef = np.asarray(coef, dtype='float64')
+        self.weights = coef / np.asarray(scale, dtype='float64')
+        self.bias = np.asarray(intercept, dtype='float64') - self.weights @ np.asarray(mean, dtype='float64')
+
+    # Function for loading a model file. If sampling_rate is given, the model must have been trained on
+    # windows sampled at that rate.
+    @staticmethod
+    def load(path, sampling_rate=None):
+        with np.load(path, allow_pickle=False) as f:
+            if int(f['version']) != MODEL_VERSION:
+                raise ValueError('Unsupported model version {} in {}'.format(int(f['version']), path))
+            optional = {k: f[k] for k in ('class_names', 'sampling_rate', 'feature_set') if k in f}
+            model = LinearModel(f['selected'], f['mean'], f['scale'], f['coef'], f['intercept'], f['pairs'],
+                                f['classes'], **optional)
+        if sampling_rate is not None:
+            model.check_sampling_rate(sampling_rate)
+        return model
+
+    # Function for checking that windows sampled at sampling_rate (Hz) give the features the model was
+    # trained on
+    def check_sampling_rate(self, sampling_rate):
+        if self.sampling_rate is not None and float(sampling_rate) != self.sampling_rate:
+            raise ValueError('Model trained on windows sampled at {:g} Hz, not {:g} Hz'.format(self.sampling_rate, sampling_rate))
+
+    # Function for calculating the decision values of selected features of shape (n_selected,) or
+    # (n, n_selected)
+    def decision(self, features):
+        return np.asarray(features, dtype='float64') @ self.weights.T + self.bias
+
+    # Function for predicting the class labels of selected features of shape (n_selected,) or (n, n_selected).
+    # Ties are resolved in favour of the first class, as in libsvm.
+    def predict(self, features):
+        decision = self.decision(features)
+        winners = np.where(decision > 0, self.pairs[:, 0], self.pairs[:, 1])
+        if winners.ndim == 1:
+            return self.classes[np.argmax(np.bincount(winners, minlength=len(self.classes)))]
+        votes = np.zeros((len(winners), len(self.classes)), dtype='int64')
+        np.add.at(votes, (np.arange(len(winners))[:, np.newaxis], winners), 1)
+        return self.classes[np.argmax(votes, axis=1)]
+
+    # Function for predicting the class of a window of shape (n_samples, n_axes), or of a stack of windows,
+    # calculating only the selected features (at the sampling rate of the model)
+    def predict_window(self, window):
+        features = extract_selected_features(window, self.selected, self.sampling_rate or 20)
+        return self.predict(features[0] if np.ndim(window) == 2 else features)
+
+    # Function for getting the name of a class label
+    def class_name(self, label):
+        return self.class_names[int(np.flatnonzero(self.classes == label)[0])]
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
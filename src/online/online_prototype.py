@@ -2,11 +2,19 @@
 #   Online classification of mobile sensor data
 #------------------------------------------------------------------------------------------------------------------
 
+import os
+import sys
 import time
-import requests
-import numpy as np
 import threading
-from scipy.interpolate import interp1d
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from acquisition.ring_buffer import RingBuffer
+from acquisition.phyphox_client import PhyphoxClient
+from acquisition.telemetry import StreamTelemetry, TelemetryReporter
+from online.streaming import SlidingWindowFeatures
+from online.linear_model import LinearModel
+from online.replay import ReplaySource
+from processing.recording import Recording
 
 ##########################################
 ############ Data properties #############
@@ -20,7 +28,9 @@ window_samples = int(window_time * sampling_rate)   # Number of samples in each
 ##### Load data and train model here #####
 ##########################################
 
-# YOUR CODE HERE
+# Linear SVC with RFE exported by training/export_model.py (plain arrays, scikit-learn is not imported)
+MODEL_FILE = 'linear_model.npz'
+model = LinearModel.load(MODEL_FILE, sampling_rate)
 
 ##########################################
 ##### Data acquisition configuration #####
@@ -28,57 +38,66 @@ window_samples = int(window_time * sampling_rate)   # Number of samples in each
 
 # Communication parameters
 IP_ADDRESS = '192.168.0.7:8080'
-COMMAND = 'accX&accY&accZ&acc_time'
-BASE_URL = "http://{}/get?{}".format(IP_ADDRESS, COMMAND)
+poll_interval = 0.01            # Time in seconds between requests (each request returns all the new samples)
+telemetry = StreamTelemetry('phone')
+
+# Replay of a raw recording (<timestamp>_raw.rec) instead of the phone: the samples of the session are
+# delivered at the pace they were recorded (times replay_speed) to the same buffer and classification path.
+# None for live acquisition. online/replay.py replays whole recordings as fast as possible.
+REPLAY_FILE = None
+replay_session = 0
+replay_speed = 1.
+
+if REPLAY_FILE:
+    client = ReplaySource(Recording(REPLAY_FILE).session_samples(replay_session), speed=replay_speed, telemetry=telemetry)
+else:
+    client = PhyphoxClient(IP_ADDRESS, sensors=('acc', 'gyro'), timeout=0.5, telemetry=telemetry)
 
 # Data buffer (circular buffer)
 max_samp_rate = 5000            # Maximum possible sampling rate
-n_signals = 3                   # Number of signals (accX, accY, accZ)
+n_signals = 6                   # Number of signals (accX, accY, accZ, gyroX, gyroY, gyroZ)
 buffer_size = max_samp_rate*5   # Buffer size (number of samples to store)
+buffer_dtype = 'float64'        # 'float32' halves the buffer (the time channel keeps about 0.1 ms for the first half hour)
 
-buffer = np.zeros((buffer_size, n_signals + 1), dtype='float64')    # Buffer for storing data
-buffer_index = 0                                                    # Index for the next data point to be written
-last_sample_time = 0.0                                              # Last sample time for the buffer
+buffer = RingBuffer(buffer_size, n_signals + 1, buffer_dtype)   # Buffer for storing data (channel 0 is time)
+
+# Periodic telemetry summary (also saved to telemetry.json): starved streams show up as a low sample rate,
+# gaps or a high label latency
+read_seq = 0        # Sequence number of the next buffer sample to be passed to the engine
+telemetry.add_probe('buffer', lambda: (buffer.count - read_seq, buffer.capacity))
+reporter = TelemetryReporter([telemetry], interval=5, path='telemetry.json')
 
 # Flag for stopping the data acquisition
 stop_recording_flag = threading.Event()
 
-# Mutex for thread-safe access to the buffer
-buffer_lock = threading.Lock()
-
-# Function for continuously fetching data from the mobile device
+# Function for continuously fetching data from the mobile device (or the replayed recording)
 def fetch_data():    
-    sleep_time = 1. / max_samp_rate 
     while not stop_recording_flag.is_set():
         try:
-            response = requests.get(BASE_URL, timeout=0.5)
-            response.raise_for_status()            
-            data = response.json()
-
-            global buffer, buffer_index, last_sample_time
-            
-            with buffer_lock:  # Ensure thread-safe access to the buffer
-                buffer[buffer_index:, 0] = data["buffer"]["acc_time"]["buffer"][0]    
-                buffer[buffer_index:, 1] = data["buffer"]["accX"]["buffer"][0]
-                buffer[buffer_index:, 2] = data["buffer"]["accY"]["buffer"][0]
-                buffer[buffer_index:, 3] = data["buffer"]["accZ"]["buffer"][0]
-
-                buffer_index = (buffer_index + 1) % buffer_size
-                last_sample_time = data["buffer"]["acc_time"]["buffer"][0] 
+            rows = client.fetch_new()
+        except Exception:
+            rows = []   # Counted by the client telemetry (number, type and last error are in the periodic summary)
 
+        try:
+            # Single writer: the buffer publishes the samples by advancing its sequence counter
+            buffer.extend(rows)
         except Exception as e:
-            print(f"Error fetching data: {e}")
+            telemetry.error(e)
+            print("Error buffering data: {}".format(e))
 
-        time.sleep(sleep_time)
+        time.sleep(poll_interval)
 
 # Function for stopping the data acquisition
 def stop_recording():
     stop_recording_flag.set()
     recording_thread.join()
+    client.close()
+    reporter.stop()
     
 # Start data acquisition
 recording_thread = threading.Thread(target=fetch_data, daemon=True)
 recording_thread.start()
+reporter.start()
 
 ##########################################
 ######### Online classification ##########
@@ -87,52 +106,42 @@ recording_thread.start()
 update_time = 0.25
 ref_time = time.time()
 
+# Sliding-window feature engine (resamples only the new raw samples and keeps the window moments updated)
+engine = SlidingWindowFeatures(n_signals, sampling_rate, window_time)
+
 while True:
         
     time.sleep(update_time)   
 
-    if buffer_index > 2*sampling_rate:  # Update every update_time seconds and only if enough data is available
+    ##### Get new data samples #####
+
+    # Pass only the samples written since the last update (views of the circular buffer, no copy)
+    views, read_seq = buffer.since(read_seq)
+    for new_raw_data in views:
+        engine.push(new_raw_data[:, 0], new_raw_data[:, 1:])
+
+    if engine.ready():  # Update every update_time seconds and only if a complete window is available
     
         ref_time = time.time()
         
-        ##### Get last data samples #####            
-        
-        # Get data from circular buffer
-        end_index = (buffer_index - 1) % buffer_size
-        start_index = (buffer_index - 2) % buffer_size
-        
-        with buffer_lock:
-
-            while (buffer[end_index, 0] - buffer[start_index, 0]) <= window_time:
-                start_index = (start_index-1) % buffer_size
-
-            indices = (buffer_index - np.arange(buffer_size, 0, -1)) % buffer_size            
-            last_raw_data = buffer[indices, :]  # Get last data samples from the buffer
-
-        # Calculate time vector for interpolation                    
-        t = last_raw_data[:, 0]  # Time vector from the buffer
-        t_uniform = np.linspace(last_sample_time-window_time, last_sample_time, int(window_time * sampling_rate))   
-
-        # interpolate each signal to a uniform time vector
-        last_data = np.zeros((len(t_uniform), n_signals))  # Array with interpolated data
-        for i in range(n_signals):
-            interp_x = interp1d(t, last_raw_data[:, i+1], kind='linear', fill_value="extrapolate") # Interpolation function for signal i
-            last_data[:,i] = interp_x(t_uniform)  # Interpolate signal i to the uniform time vector
-                        
+        last_data = engine.window_data()    # Last window resampled to a uniform time vector
         print ("Window data:\n", last_data)
 
         #######################################################
         ##### Calculate features of the last data samples #####
         #######################################################
 
-        # YOUR feature calculation code here
-        # Features must be the same as the calculated above when the model was trained        
-        
+        # Only the features selected by the model are calculated, with the window moments kept up to date
+        # by the engine (the same values as extract_features() when the model was trained)
+        features = engine.selected_features(model.selected)
+
         #################################################################
         ##### Evaluate classifier here with the calculated features #####
         #################################################################
         
-        # YOUR classification code here
+        label = model.predict(features)
+        telemetry.label(engine.last_time)   # Latency from the last sample of the window to its label
+        print ("Prediction: {} ({})".format(model.class_name(label), int(label)))
         
      
 # Stop data acquisition
@@ -0,0 +1,217 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Replay of recorded raw sessions through the online classification path
+#------------------------------------------------------------------------------------------------------------------
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from acquisition.ring_buffer import RingBuffer
+from online.streaming import SlidingWindowFeatures
+from online.linear_model import LinearModel
+from processing.features import extract_features, extract_selected_features
+from processing.recording import Recording
+from processing.resampling import resample_windows
+
+# Replay source: the samples of a raw session (channel 0 is time) delivered in the order and at the pace they
+# were acquired. fetch_new() returns the samples acquired since the previous call, in the same layout as
+# PhyphoxClient.fetch_new(), with the recorded time running speed times faster than the wall clock, so it
+# can take the place of the client in the acquisition thread. fetch_until() returns the samples up to a
+# given recorded time instead (simulated clock, no waiting). As with the client, the samples and the errors
+# of fetch_new() are reported to an optional StreamTelemetry.
+class ReplaySource:
+
+    def __init__(self, samples, speed=1., telemetry=None):
+        self.samples = samples
+        self.speed = speed
+        self.telemetry = telemetry
+        self.n_channels = samples.shape[1]
+        self.t = np.maximum.accumulate(np.asarray(samples[:, 0], dtype='float64'))     # Search key (jitter may reorder samples)
+        self.t0 = self.t[0] if len(self.t) else 0.
+        self.position = 0                       # Index of the next sample to deliver
+        self.start = None
+
+    @property
+    def finished(self):
+        return self.position >= len(self.samples)
+
+    # Function for getting the samples recorded up to time t (recording clock) that were not delivered yet
+    def fetch_until(self, t):
+        end = max(self.position, int(np.searchsorted(self.t, t, side='right')))
+        rows = np.array(self.samples[self.position:end], dtype='float64')
+        self.position = end
+        return rows
+
+    # Function for getting the samples acquired since the previous call (wall clock, scaled by speed)
+    def fetch_new(self):
+        if self.start is None:
+            self.start = time.perf_counter()
+        try:
+            rows = self.fetch_until(self.t0 + self.speed * (time.perf_counter() - self.start))
+        except Exception as e:
+            if self.telemetry is not None:
+                self.telemetry.error(e)
+            raise
+        if self.telemetry is not None:
+            self.telemetry.samples(len(rows), rows[:, 0])
+        return rows
+
+    def close(self):
+        pass
+
+# Function for getting the labeled intervals of a session of a raw recording as (start time, stop time,
+# condition ID) rows (the windows written by data_acquisition_new.py)
+def session_intervals(rec, session):
+    first, last = rec.header['sessions'][session]['windows']
+    windows = np.asarray(rec.windows[first:last])
+    if len(windows) == 0:
+        return np.zeros((0, 3))
+    t = rec.samples[:, 0]                   # Window offsets are rows of samples.bin
+    stops = np.maximum(windows[:, 1] - 1, windows[:, 0])
+    return np.column_stack((t[windows[:, 0]], t[stops], windows[:, 2]))
+
+# Function for replaying the samples of one session through the online path of online_prototype.py: every
+# update_time seconds (recording clock) the new samples go into the ring buffer, the buffer is read from
+# the last position into the sliding-window engine and, when a window is complete, the model features are
+# calculated and classified. With speed=None the steps run back to back (as fast as possible), otherwise
+# they follow the wall clock at speed times real time.
+#   Returns a dict with the time of each step that produced a label ('latency', from the insertion of the
+#   samples to the label), the start time of its window, the resampled window, its streaming features (the
+#   incremental engine features, all the columns) and the label (None without a model).
+def replay_session(samples, model=None, speed=None, update_time=0.25, sampling_rate=20, window_time=0.5,
+                   buffer_size=25000):
+    source = ReplaySource(samples, speed)
+    buffer = RingBuffer(buffer_size, samples.shape[1])
+    engine = SlidingWindowFeatures(samples.shape[1] - 1, sampling_rate, window_time)
+    read_seq = 0
+
+    latencies, window_starts, windows, streaming, labels = [], [], [], [], []
+    lag = 0.                                    # Maximum delay of a step behind its schedule (real time)
+    t_step = source.t0
+    wall_start = time.perf_counter()
+    while not source.finished:
+        t_step += update_time
+        if speed:
+            scheduled = wall_start + (t_step - source.t0) / speed
+            time.sleep(max(0., scheduled - time.perf_counter()))
+            lag = max(lag, time.perf_counter() - scheduled)
+
+        start = time.perf_counter()
+        buffer.extend(source.fetch_until(t_step))
+        views, read_seq = buffer.since(read_seq)
+        for new_raw_data in views:
+            engine.push(new_raw_data[:, 0], new_raw_data[:, 1:])
+        if not engine.ready():
+            continue
+        window = engine.window_data()
+        label = None
+        if model is not None:
+            label = model.predict(engine.selected_features(model.selected))
+        latencies.append(time.perf_counter() - start)
+
+        window_starts.append(engine.next_time - engine.window_samples * engine.dt)
+        windows.append(window)
+        streaming.append(engine.features())
+        labels.append(label)
+
+    return {'wall_time': time.perf_counter() - wall_start, 'replayed_time': t_step - source.t0, 'lag': lag,
+            'latency': np.array(latencies), 'window_start': np.array(window_starts), 'windows': np.array(windows),
+            'features': np.array(streaming).reshape(len(streaming), -1), 'labels': labels}
+
+# Function for comparing the streaming output of a session with the offline path (resample_windows() over
+# the whole session and extract_features(), as used to build the training data). Returns the maximum
+# deviation of the resampled windows, the maximum deviation of the features (relative to
+# max(1, |offline value|)) and the number of labels that differ.
+def check_session(samples, result, model=None, sampling_rate=20, window_time=0.5):
+    samples = np.asarray(samples, dtype='float64')
+    windows = resample_windows(samples[:, 0], samples[:, 1:], result['window_start'], window_time,
+                               int(sampling_rate * window_time))
+    window_deviation = float(np.max(np.abs(result['windows'] - windows))) if len(windows) else 0.
+    offline = extract_features(windows)
+    with np.errstate(invalid='ignore'):
+        deviation = np.abs(result['features'] - offline) / np.maximum(1., np.abs(offline))
+    both_nan = np.isnan(result['features']) & np.isnan(offline)
+    deviation = np.where(both_nan, 0., np.where(np.isnan(deviation), np.inf, deviation))
+
+    mismatches = 0
+    if model is not None and len(windows):
+        offline_labels = model.predict(extract_selected_features(windows, model.selected, sampling_rate))
+        mismatches = int(np.sum(offline_labels != np.array(result['labels'])))
+    return window_deviation, float(np.max(deviation)) if deviation.size else 0., mismatches
+
+# Function for scoring the labels of a session against the windows recorded during acquisition. Only the
+# labels whose window is centered inside a recorded window are scored. Returns (number scored, number
+# correct).
+def score_session(intervals, result, window_time=0.5):
+    if len(intervals) == 0 or len(result['labels']) == 0 or result['labels'][0] is None:
+        return 0, 0
+    centers = result['window_start'] + window_time / 2.
+    idx = np.searchsorted(intervals[:, 0], centers, side='right') - 1
+    inside = (idx >= 0) & (centers <= intervals[np.maximum(idx, 0), 1])
+    truth = intervals[np.maximum(idx, 0), 2]
+    correct = np.array(result['labels'], dtype='float64') == truth
+    return int(np.sum(inside)), int(np.sum(inside & correct))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay raw recordings through the online classification path')
+    parser.add_argument('recordings', nargs='+', help='Raw recordings (<timestamp>_raw.rec, channel 0 is time)')
+    parser.add_argument('--model', help='Model file written by training/export_model.py (without it only the features are checked)')
+    parser.add_argument('--speed', type=float, default=0., help='Replay speed relative to real time (0 = as fast as possible)')
+    parser.add_argument('--update-time', type=float, default=0.25, help='Time in seconds between classifications')
+    parser.add_argument('--sampling-rate', type=int, default=20, help='Sampling rate in Hz of the windows')
+    parser.add_argument('--window-time', type=float, default=0.5, help='Window length in seconds')
+    parser.add_argument('--tolerance', type=float, default=1e-6, help='Maximum deviation of the streaming windows and features from the offline ones (the engine keeps its moments within about 1e-9)')
+    parser.add_argument('--no-check', action='store_true', help='Do not compare with the offline features')
+    parser.add_argument('--output', help='JSON file for the results')
+    args = parser.parse_args()
+
+    model = LinearModel.load(args.model, args.sampling_rate) if args.model else None
+    speed = args.speed if args.speed > 0 else None
+    results, failed = [], False
+    print("{:<30} {:>8} {:>10} {:>9} {:>9} {:>9} {:>10} {:>10} {:>9} {:>9}".format('session', 'windows', 'windows/s', 'speedup',
+          'p50 (ms)', 'p99 (ms)', 'window dev', 'feat. dev', 'mismatch', 'accuracy'))
+    for path in args.recordings:
+        rec = Recording(path)
+        if rec.channels[0] != 'time':
+            sys.exit("{} is not a raw recording".format(path))
+        for session in range(len(rec.header['sessions'])):
+            samples = rec.session_samples(session)
+            if len(samples) < 2:
+                continue
+            result = replay_session(samples, model, speed, args.update_time, args.sampling_rate, args.window_time)
+            latency = 1000. * result['latency'] if len(result['latency']) else np.zeros(1)
+            window_deviation, deviation, mismatches = (None, None, None) if args.no_check else \
+                check_session(samples, result, model, args.sampling_rate, args.window_time)
+            n_scored, n_correct = score_session(session_intervals(rec, session), result, args.window_time)
+
+            summary = {'recording': path, 'session': session, 'windows': len(result['latency']),
+                       'replayed_time': result['replayed_time'], 'wall_time': result['wall_time'],
+                       'windows_per_s': len(result['latency']) / result['wall_time'],
+                       'speedup': result['replayed_time'] / result['wall_time'], 'max_lag': result['lag'],
+                       'latency_p50_ms': float(np.percentile(latency, 50)), 'latency_p99_ms': float(np.percentile(latency, 99)),
+                       'latency_max_ms': float(np.max(latency)), 'window_deviation': window_deviation,
+                       'feature_deviation': deviation,
+                       'label_mismatches': mismatches, 'scored': n_scored,
+                       'accuracy': n_correct / n_scored if n_scored else None}
+            results.append(summary)
+            failed |= deviation is not None and max(window_deviation, deviation) > args.tolerance
+            print("{:<30} {:>8} {:>10.1f} {:>9.1f} {:>9.3f} {:>9.3f} {:>10} {:>10} {:>9} {:>9}".format(
+                '{}:{}'.format(os.path.basename(path.rstrip(os.sep)), session), summary['windows'],
+                summary['windows_per_s'], summary['speedup'], summary['latency_p50_ms'], summary['latency_p99_ms'],
+                '-' if deviation is None else '{:.1e}'.format(window_deviation),
+                '-' if deviation is None else '{:.1e}'.format(deviation), '-' if mismatches is None else mismatches,
+                '-' if summary['accuracy'] is None else '{:.3f}'.format(summary['accuracy'])))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if failed:
+        sys.exit("Streaming features deviate from the offline features by more than {:g}".format(args.tolerance))
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
@@ -0,0 +1,170 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Incremental sliding-window feature engine for online classification
+#------------------------------------------------------------------------------------------------------------------
+import numpy as np
+
+from processing.features import extract_selected_features, features_from_moments
+from processing.resampling import interpolate
+
+# Sliding-window feature engine.
+# Raw samples are pushed as they arrive; only the newly arrived samples are resampled to the uniform output
+# grid, and the power sums of the current window are updated with the samples that enter and leave it, so
+# each push costs O(hop) regardless of how much raw data has been acquired.
+# The sums are recalculated exactly from the window every refresh_samples samples, and also as soon as
+# their rounding error could reach relative_error of the central moments of the current window: the error
+# of each sum grows with the magnitude of the terms added and removed since the last recalculation, which
+# is large after an active segment (or with a shift far from the window mean) compared with the moments of
+# the low-variance windows that follow it.
+class SlidingWindowFeatures:
+
+    def __init__(self, n_axes, sampling_rate=20, window_time=0.5, refresh_samples=1000, relative_error=1e-9):
+        self.n_axes = n_axes
+        self.sampling_rate = sampling_rate
+        self.window_time = window_time
+        self.window_samples = int(window_time * sampling_rate)         # Number of samples in each window
+        self.dt = window_time / (self.window_samples - 1)              # Same spacing as np.linspace() in acquisition
+        self.refresh_samples = refresh_samples                         # Samples between exact recalculations of the sums
+        self.max_magnitude = relative_error / np.finfo('float64').eps  # Maximum magnitude of the sums relative to the moments
+
+        self.window = np.zeros((self.window_samples, n_axes))          # Resampled window (circular)
+        self.head = 0                                                  # Index of the oldest sample of the window
+        self.n_filled = 0                                              # Number of valid samples in the window
+        self.n_samples = 0                                             # Total number of resampled samples
+        self.last_time = None                                          # Time of the last raw sample
+        self.last_value = None                                         # Value of the last raw sample
+        self.next_time = None                                          # Time of the next uniform sample
+
+        self.shift = np.zeros(n_axes)                                  # Reference value of the power sums
+        self.sums = np.zeros((4, n_axes))                              # Power sums (orders 1 to 4) of the shifted window
+        self.magnitudes = np.zeros((4, n_axes))                        # Sums of the absolute terms added and removed since the last refresh
+        self.since_refresh = 0
+        self.cached_features = None
+
+    # Function for adding raw samples (t: shape (n,), x: shape (n, n_axes)). Returns the number of new
+    # uniform samples that entered the window.
+    def push(self, t, x):
+        t = np.asarray(t, dtype='float64')
+        x = np.asarray(x, dtype='float64').reshape(len(t), self.n_axes)
+
+        # Discard repeated and out of order timestamps (polling returns the same sample several times)
+        if self.last_time is not None:
+            keep = t > self.last_time
+            t, x = t[keep], x[keep]
+        if len(t) > 1:
+            keep = np.concatenate(([True], np.diff(t) > 0))
+            t, x = t[keep], x[keep]
+        if len(t) == 0:
+            return 0
+
+        if self.last_time is None:
+            self.next_time = t[0]
+            self.shift = x[0].copy()
+            raw_t, raw_x = t, x
+        else:
+            raw_t = np.concatenate(([self.last_time], t))
+            raw_x = np.vstack((self.last_value, x))
+        self.last_time = t[-1]
+        self.last_value = x[-1]
+
+        # Resample the new raw samples to the uniform grid
+        n_new = int(np.floor((self.last_time - self.next_time) / self.dt + 1e-9)) + 1
+        if n_new <= 0:
+            return 0
+        t_uniform = self.next_time + self.dt * np.arange(n_new)
+        self.next_time = t_uniform[-1] + self.dt
+        new_data = interpolate(raw_t, raw_x, t_uniform)
+
+        self.add_samples(new_data)
+        return n_new
+
+    # Function for adding uniform samples to the window and updating its power sums
+    def add_samples(self, new_data):
+        n_new = len(new_data)
+        self.cached_features = None
+        self.n_samples += n_new
+        self.since_refresh += n_new
+
+        if n_new >= self.window_samples or self.since_refresh >= self.refresh_samples:
+            self.insert(new_data[-self.window_samples:])
+            self.refresh()
+            return
+
+        # Samples leaving the window (only once it is full)
+        n_leaving = max(0, self.n_filled + n_new - self.window_samples)
+        leaving = self.window[(self.head + np.arange(n_leaving)) % self.window_samples]
+        self.insert(new_data)
+
+        entering = new_data - self.shift
+        leaving = leaving - self.shift
+        for p in range(4):
+            entering_p, leaving_p = entering**(p + 1), leaving**(p + 1)
+            self.sums[p] += np.sum(entering_p, axis=0) - np.sum(leaving_p, axis=0)
+            self.magnitudes[p] += np.sum(np.abs(entering_p), axis=0) + np.sum(np.abs(leaving_p), axis=0)
+        if self.precision_lost():
+            self.refresh()
+
+    # Function that indicates whether the rounding error of the power sums (about eps times the magnitudes
+    # accumulated since the last refresh) could exceed relative_error of the central moments, measured in
+    # powers of the standard deviation of the window
+    def precision_lost(self):
+        n = self.n_filled
+        m2 = np.maximum(self.sums[1] / n - (self.sums[0] / n)**2, 0.)
+        scale = m2 ** (np.arange(1, 5)[:, np.newaxis] / 2.)
+        return bool(np.any(self.magnitudes > self.max_magnitude * n * scale))
+
+    # Function for writing uniform samples into the circular window
+    def insert(self, new_data):
+        n_new = len(new_data)
+        indices = (self.head + self.n_filled + np.arange(n_new)) % self.window_samples
+        self.window[indices] = new_data
+        n_leaving = max(0, self.n_filled + n_new - self.window_samples)
+        self.head = (self.head + n_leaving) % self.window_samples
+        self.n_filled = min(self.window_samples, self.n_filled + n_new)
+
+    # Function for recalculating the power sums from the window, centered on its mean (bounds the
+    # accumulated rounding error)
+    def refresh(self):
+        data = self.window_data()
+        self.shift = np.mean(data, axis=0)
+        shifted = data - self.shift
+        for p in range(4):
+            self.sums[p] = np.sum(shifted**(p + 1), axis=0)
+            self.magnitudes[p] = np.sum(np.abs(shifted)**(p + 1), axis=0)
+        self.since_refresh = 0
+
+    # Function that indicates whether a complete window is available
+    def ready(self):
+        return self.n_filled == self.window_samples
+
+    # Function for getting the samples of the window in chronological order
+    def window_data(self):
+        indices = (self.head + np.arange(self.n_filled)) % self.window_samples
+        return self.window[indices]
+
+    # Function for getting the mean and the central moments of the window from its power sums
+    def moments(self):
+        n = self.n_filled
+        s1, s2, s3, s4 = self.sums / n
+        mu = s1
+        m2 = s2 - mu**2
+        m3 = s3 - 3*mu*s2 + 2*mu**3
+        m4 = s4 - 4*mu*s3 + 6*mu**2*s2 - 3*mu**4
+        return mu + self.shift, m2, m3, m4
+
+    # Function for getting only some of the features of the current window (e.g. the ones selected by a
+    # model), with the moments from the power sums (same values as extract_selected_features())
+    def selected_features(self, indices):
+        return extract_selected_features(self.window_data(), indices, self.sampling_rate, self.moments())[0]
+
+    # Function for getting the feature vector of the current window (same features as extract_features())
+    def features(self):
+        if self.cached_features is None and self.ready():
+            mean, m2, m3, m4 = self.moments()
+            self.cached_features = features_from_moments(self.window_data()[np.newaxis], mean[np.newaxis],
+                                                         m2[np.newaxis], m3[np.newaxis], m4[np.newaxis], 'basic',
+                                                         self.sampling_rate)[0]
+        return self.cached_features
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
@@ -0,0 +1,150 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Batch feature extraction over a directory of recordings (process pool)
+#------------------------------------------------------------------------------------------------------------------
+import os
+import re
+import sys
+import time
+import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from processing.feature_cache import FeatureCache, feature_params, recording_features
+from processing.features import FEATURE_SETS
+from processing.recording import Recording
+
+# Default directory of the recordings
+RAW_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'raw'))
+
+# Function for finding the recordings of windows (.obj files and .rec directories) under a directory.
+# Raw sample recordings (first channel 'time', written during acquisition) are skipped.
+def find_recordings(directory):
+    found = []
+    for root, dirs, files in os.walk(directory):
+        for d in sorted(dirs):
+            if d.endswith('.rec'):
+                path = os.path.join(root, d)
+                if Recording(path).channels[0] != 'time':
+                    found.append(path)
+        dirs[:] = sorted(d for d in dirs if not d.endswith('.rec') and not d.startswith('.'))
+        found += [os.path.join(root, f) for f in sorted(files) if f.endswith('.obj')]
+    return found
+
+# Function for getting the subject of a recording: the first directory under the root if the recordings are
+# organized by subject, otherwise the leading letters of the file name (luis_data_1.obj -> luis), or the
+# file name itself
+def subject_of(path, root):
+    parts = os.path.relpath(path, root).split(os.sep)
+    if len(parts) > 1:
+        return parts[0]
+    name = os.path.splitext(parts[0])[0]
+    match = re.match(r'[A-Za-z]+', name)
+    return match.group(0) if match else name
+
+# Function for getting the session of each window of a recording (session ID of .rec recordings, 0 for .obj)
+def window_sessions(path):
+    if os.path.isdir(path):
+        return np.asarray(Recording(path).windows[:, 3])
+    return None
+
+# Function for processing one recording in a worker process. The feature table is handed back in a shared
+# memory block (only its name, shape and dtype go through the result pipe); the main process copies and frees
+# it. dtype is the dtype of the feature table (float64 or float32).
+def process_recording(path, cache_dir=None, feature_set='basic', dtype='float64'):
+    start = time.perf_counter()
+    compute = partial(recording_features, feature_set=feature_set, dtype=dtype)
+    if cache_dir:
+        features = FeatureCache(cache_dir).features(path, compute, feature_params(feature_set, dtype=dtype))
+    else:
+        features = compute(path)
+    features = np.ascontiguousarray(features, dtype=dtype)
+
+    shm = shared_memory.SharedMemory(create=True, size=max(features.nbytes, 1))
+    np.ndarray(features.shape, features.dtype, buffer=shm.buf)[:] = features
+    resource_tracker.unregister(shm._name, 'shared_memory')    # Owned (and unlinked) by the main process
+    shm.close()
+    return (shm.name, features.shape, features.dtype.str), window_sessions(path), time.perf_counter() - start
+
+# Function for copying a feature table out of a shared memory block and freeing the block
+def take_shared(name, shape, dtype):
+    shm = shared_memory.SharedMemory(name=name)
+    features = np.ndarray(shape, dtype=dtype, buffer=shm.buf).copy()
+    shm.close()
+    shm.unlink()
+    return features
+
+# Function for processing all the recordings. Returns the merged dataset as a dict of arrays: data (condition
+# ID and features, the layout of activity_data.txt) and the subject, session and recording of each row.
+def process_recordings(paths, root, n_jobs=1, cache_dir=None, progress=True, feature_set='basic', dtype='float64'):
+    results = {}
+    start = time.perf_counter()
+
+    def report(path, shape, elapsed):
+        if progress:
+            print("[{}/{}] {} ({} windows, {:.2f} s)".format(len(results), len(paths), os.path.relpath(path, root), shape[0], elapsed))
+
+    if n_jobs == 1:
+        for path in paths:
+            table, sessions, elapsed = process_recording(path, cache_dir, feature_set, dtype)
+            results[path] = (take_shared(*table), sessions)
+            report(path, table[1], elapsed)
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = {pool.submit(process_recording, path, cache_dir, feature_set, dtype): path for path in paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                table, sessions, elapsed = future.result()
+                results[path] = (take_shared(*table), sessions)
+                report(path, table[1], elapsed)
+
+    # Merge the tables in discovery order (recordings whose number of channels differs from most of the
+    # others cannot share the feature columns and are left out)
+    n_columns = [results[path][0].shape[1] for path in paths]
+    n_common = max(set(n_columns), key=n_columns.count)
+    tables, subjects, sessions, recordings = [], [], [], []
+    for path, n_cols in zip(paths, n_columns):
+        features, session_ids = results[path]
+        relpath = os.path.relpath(path, root)
+        if n_cols != n_common:
+            print("Skipping {} ({} feature columns instead of {})".format(relpath, n_cols - 1, n_common - 1))
+            continue
+        n = len(features)
+        session_ids = np.zeros(n, dtype='int64') if session_ids is None else session_ids
+        tables.append(features)
+        subjects += [subject_of(path, root)] * n
+        sessions += ['{}:{}'.format(relpath, s) for s in session_ids]
+        recordings += [relpath] * n
+    if progress:
+        print("Processed {} recordings in {:.2f} s".format(len(paths), time.perf_counter() - start))
+
+    return {'data': np.vstack(tables), 'subject': np.array(subjects), 'session': np.array(sessions),
+            'recording': np.array(recordings)}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Extract the features of every recording under a directory')
+    parser.add_argument('directory', nargs='?', default=RAW_DIR, help='Directory with .obj files and .rec recordings (default: data/raw)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='Number of worker processes')
+    parser.add_argument('--cache', help='Feature cache directory (recordings that did not change are not processed again)')
+    parser.add_argument('--features', choices=FEATURE_SETS, default='basic', help='Feature set (extended adds the spectral bank)')
+    parser.add_argument('--dtype', choices=('float64', 'float32'), default='float64', help='dtype of the feature table (float32 halves its size)')
+    parser.add_argument('--output', default='dataset.npz', help='Merged dataset (.npz with data, subject, session and recording arrays)')
+    parser.add_argument('--txt', help='Also write the data as text, in the layout of activity_data.txt')
+    args = parser.parse_args()
+
+    paths = find_recordings(args.directory)
+    if not paths:
+        sys.exit("No recordings found in {}".format(args.directory))
+
+    dataset = process_recordings(paths, args.directory, args.jobs, args.cache, feature_set=args.features, dtype=args.dtype)
+    np.savez(args.output, **dataset)
+    if args.txt:
+        np.savetxt(args.txt, dataset['data'])
+    print("{} windows from {} subjects saved to {}".format(len(dataset['data']), len(set(dataset['subject'])), args.output))
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
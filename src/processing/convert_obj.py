@@ -0,0 +1,47 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Conversion of pickled .obj recordings to the memory-mappable recording format
+#------------------------------------------------------------------------------------------------------------------
+import os
+import sys
+import glob
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from processing.recording import load_windows, save_windows
+
+# Channel names of the windows saved by the acquisition scripts
+CHANNELS = {3: ['accX', 'accY', 'accZ'], 6: ['accX', 'accY', 'accZ', 'gyroX', 'gyroY', 'gyroZ']}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert pickled .obj recordings to .rec recordings')
+    parser.add_argument('inputs', nargs='*', help='.obj files (default: data/raw/*.obj)')
+    parser.add_argument('--output', help='Output directory (default: next to each input file)')
+    parser.add_argument('--append', help='Append every input as a new session of this .rec recording')
+    args = parser.parse_args()
+
+    inputs = args.inputs or sorted(glob.glob(os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'raw', '*.obj'))))
+    for file_name in inputs:
+        data = load_windows(file_name)
+        n_channels = data[0][2].shape[1]
+        channels = CHANNELS.get(n_channels, ['x{}'.format(i) for i in range(n_channels)])
+
+        if args.append:
+            output = args.append
+        else:
+            output = os.path.splitext(file_name)[0] + '.rec'
+            if args.output:
+                output = os.path.join(args.output, os.path.basename(output))
+            if os.path.exists(output):
+                print("Skipping {} ({} already exists)".format(file_name, output))
+                continue
+
+        try:
+            save_windows(output, data, channels, source=os.path.basename(file_name))
+        except ValueError as e:
+            print("Skipping {} ({})".format(file_name, e))
+            continue
+        print("{} -> {} ({} windows, {} channels)".format(file_name, output, len(data), n_channels))
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
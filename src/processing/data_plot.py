@@ -1,86 +1,88 @@
 #------------------------------------------------------------------------------------------------------------------
-#   Real-time plot for acceleration data.
+#   Real-time plot for acceleration and gyroscope data.
 #------------------------------------------------------------------------------------------------------------------
+import os
+import sys
 import time
-import requests
-from collections import deque
 from threading import Thread
 
-import matplotlib.animation as animation
-import matplotlib.pyplot as plt
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from acquisition.phyphox_client import PhyphoxClient
+from acquisition.ring_buffer import RingBuffer
+from acquisition.telemetry import StreamTelemetry, TelemetryReporter
+from processing.live_plot import LivePlot
+from online.linear_model import LinearModel
+from online.streaming import SlidingWindowFeatures
 
 # Communication parameters
 IP_ADDRESS = '192.168.0.7:8080'
-COMMAND = 'accX&accY&accZ&acc_time'
-BASE_URL = "http://{}/get?{}".format(IP_ADDRESS, COMMAND)
+telemetry = StreamTelemetry('phone')
+client = PhyphoxClient(IP_ADDRESS, sensors=('acc', 'gyro'), timeout=1, telemetry=telemetry)
 
 # Data acquisition parameters
-samps_per_frame = 200           # Number of samples per frame
-sampling_rate = 20              # Hz (Sampling rate)
-sleep_time = 1. / sampling_rate # Sleep time in seconds for each request
+poll_interval = 0.01            # Time in seconds between requests (each request returns all the new samples)
+max_samp_rate = 500             # Maximum expected sampling rate in Hz
 
-# Data buffers (circular buffers)
-t = deque(maxlen = samps_per_frame)
-x1 = deque(maxlen = samps_per_frame)
-x2 = deque(maxlen = samps_per_frame)
-x3 = deque(maxlen = samps_per_frame)
+# Plot parameters (frames are drawn at their own rate, independently of the requests)
+plot_time = 10                  # Time in seconds shown in the plot
+frame_interval = 0.05           # Time in seconds between frames
+autoscale_interval = 1.         # Time in seconds between checks of the y limits
+
+# Data buffer (circular buffer, channel 0 is time)
+buffer = RingBuffer(int(2 * plot_time * max_samp_rate), 7)
+
+# Live predicted label (shown when a model exported by training/export_model.py is available)
+MODEL_FILE = 'linear_model.npz'
+sampling_rate = 20              # Sampling rate in Hz of the classified windows
+window_time = 0.5               # Window size in seconds
+model = LinearModel.load(MODEL_FILE, sampling_rate) if os.path.exists(MODEL_FILE) else None
+engine = SlidingWindowFeatures(6, sampling_rate, window_time)
+read_seq = 0
 
 # Function for continuously fetching data from the mobile device
 def fetch_data():
     
-    acquire = True
-    
-    while acquire:
+    while True:
         try:
-            response = requests.get(BASE_URL, timeout=1)
-            response.raise_for_status()
-            data = response.json()
-            accX = data["buffer"]["accX"]["buffer"][0]
-            accY = data["buffer"]["accY"]["buffer"][0]
-            accZ = data["buffer"]["accZ"]["buffer"][0]
-            timestamp = data["buffer"]["acc_time"]["buffer"][0]
-
-            t.append(timestamp)
-            x1.append(accX)
-            x2.append(accY)
-            x3.append(accZ)           
+            # All the samples received by the device since the previous request
+            rows = client.fetch_new()
+        except Exception:
+            rows = []   # Counted by the client telemetry (number, type and last error are in the periodic summary)
 
+        try:
+            buffer.extend(rows)
         except Exception as e:
-            print(f"Error: {e}")
-            acquire = False
+            telemetry.error(e)
+            print("Error buffering data: {}".format(e))
 
-        time.sleep(sleep_time)
+        time.sleep(poll_interval)
 
-# Initialize plots
-fig, (ax1, ax2, ax3) = plt.subplots(3)
-
-# 
-def animate(i):
-    if len(t) > 1:
-        ax1.clear()
-        ax1.plot(t, x1)
-        ax1.set_ylim(min(x1) - 1, max(x1) + 1)
-        ax1.set_ylabel("X")
+# Function for classifying the last window (called on every frame, only the new samples are processed)
+def predicted_label():
+    global read_seq
+    if model is None:
+        return ''
+    views, read_seq = buffer.since(read_seq)
+    for v in views:
+        engine.push(v[:, 0], v[:, 1:])
+    if not engine.ready():
+        return ''
+    label = model.class_name(model.predict(engine.selected_features(model.selected)))
+    telemetry.label(engine.last_time)
+    return label
 
-        ax2.clear()
-        ax2.plot(t, x2)
-        ax1.set_ylim(min(x2) - 1, max(x2) + 1)
-        ax2.set_ylabel("Y")
-
-        ax3.clear()
-        ax3.plot(t, x3)
-        ax1.set_ylim(min(x3) - 1, max(x3) + 1)
-        ax3.set_ylabel("Z")
-        ax3.set_xlabel("Time (s)")
+# Initialize plots
+plot = LivePlot(buffer, [("Acceleration", [1, 2, 3], ['X', 'Y', 'Z']), ("Gyroscope", [4, 5, 6], ['X', 'Y', 'Z'])],
+                plot_time, frame_interval, autoscale_interval, label=predicted_label)
 
 # Launch data fetching in a separate thread
 thread = Thread(target=fetch_data, daemon=True)
 thread.start()
 
-# Set up the animation
-ani = animation.FuncAnimation(fig, animate, interval=200, cache_frame_data=False)
-plt.tight_layout()
-plt.show()
+# Show the plot (with a periodic telemetry summary)
+reporter = TelemetryReporter([telemetry], interval=5).start()
+plot.show()
+reporter.stop()
 
 #------------------------------------------------------------------------------------------------------------------
 #   End of file
@@ -1,50 +1,38 @@
 #------------------------------------------------------------------------------------------------------------------
 #   Mobile sensor data acquisition and processing
 #------------------------------------------------------------------------------------------------------------------
-import pickle
+import os
+import sys
+from functools import partial
+
 import numpy as np
-from scipy import stats
-from scipy.fft import fft
 
-# Load data
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from processing.feature_cache import FeatureCache, feature_params, recording_features
+
+# Features are cached by content (recording, feature parameters and feature version), so they are only
+# calculated again when one of them changes. The windows are already cut in the recording, so only the
+# arguments of recording_features() are part of the key.
+cache_dir = '.feature_cache'
+feature_set = 'basic'       # 'basic' (55 features) or 'extended' (adds band energies, dominant frequency, spectral entropy and axis correlations)
+feature_dtype = 'float64'   # 'float64' or 'float32' (half the memory and disk space of the feature table)
+sampling_rate = 20          # Sampling rate in Hz of the windows
+cache = FeatureCache(cache_dir, max_bytes=500 * 2**20)
+
+# Load data (.rec recording, or legacy pickled .obj file) and process all the windows at once (features are
+# calculated for each signal, one signal per axis)
 file_name = 'luis_data_1.obj'
-inputFile = open(file_name, 'rb')
-experiment_data = pickle.load(inputFile)
-
-# Process each trial and build data matrices
-features = []
-for tr in experiment_data:
-    
-    # For each signal (one signal per axis)
-    feat = [tr[1]]
-    rms = 0
-    for s in range(tr[2].shape[1]):
-        sig = tr[2][:,s]
-
-        feat.append(np.average(sig))
-        feat.append(np.std(sig))
-        feat.append(stats.kurtosis(sig))
-        feat.append(stats.skew(sig))
-        fft_vals = fft(sig)
-        feat.append(np.abs(fft_vals[0]))
-        feat.append(np.mean(np.abs(fft_vals)))
-        feat.append(np.std(np.abs(fft_vals)))
-        feat.append(np.max(sig))
-        feat.append(np.min(sig))
-        rms += np.sum(sig**2)
-        
-    rms = np.sqrt(rms)    
-    feat.append(rms)
-    
-    features.append(feat)      
+features = cache.features(file_name, partial(recording_features, feature_set=feature_set, sampling_rate=sampling_rate,
+                                             dtype=feature_dtype), feature_params(feature_set, sampling_rate, feature_dtype))
 
 # Build x and y arrays
-processed_data =  np.array(features)
+processed_data = features
 x = processed_data[:,1:]
 y = processed_data[:,0]
 
-# Save processed data
-np.savetxt("activity_data.txt", processed_data)
+# Save processed data (text for the notebook, binary for the training scripts; 9 digits are exact for float32)
+np.savetxt("activity_data.txt", processed_data, fmt='%.18e' if processed_data.dtype == np.float64 else '%.9g')
+np.save("activity_data.npy", processed_data)
 
 #------------------------------------------------------------------------------------------------------------------
 #   End of file
@@ -0,0 +1,178 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Content-addressed cache of the features of each recording
+#------------------------------------------------------------------------------------------------------------------
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from processing.features import FEATURE_VERSION, extract_features
+from processing.recording import load_windows
+
+# Files whose content identifies a recording (.rec directory) or the file itself (.obj)
+REC_FILES = ('samples.bin', 'windows.bin')
+
+# Function for calculating the feature table of a recording: one row per window with the condition ID in the
+# first column and the features in the rest (the layout of activity_data.txt)
+# (dtype of the table: float64, or float32 for half the memory and disk space)
+def recording_features(path, feature_set='basic', sampling_rate=20, dtype='float64'):
+    data = load_windows(path)
+    labels = np.array([tr[1] for tr in data], dtype='float64')
+    windows = np.stack([tr[2] for tr in data])
+    return np.column_stack((labels, extract_features(windows, feature_set, sampling_rate))).astype(dtype, copy=False)
+
+# Function for getting the cache parameters of recording_features() with the given arguments (every script
+# builds its key here, so the same features share one entry; dtype is only included when it is not
+# float64)
+def feature_params(feature_set='basic', sampling_rate=20, dtype='float64'):
+    params = {'sampling_rate': float(sampling_rate), 'feature_set': feature_set}
+    if np.dtype(dtype) != np.float64:
+        params['dtype'] = np.dtype(dtype).name
+    return params
+
+# Function for listing the files that hold the content of a recording
+def content_files(path):
+    if os.path.isdir(path):
+        return [os.path.join(path, name) for name in ('header.json',) + REC_FILES]
+    return [path]
+
+# Feature cache.
+# Every entry is a .npy file named after the hash of the raw recording content, the feature parameters and
+# FEATURE_VERSION, so changing any of them gives a new key and unchanged recordings are never recomputed.
+# Hashing a recording reads all of it, so the hash of each file is also remembered in index.json together
+# with its size and modification time, and only recalculated when those change. Entries are evicted by age
+# (time since last use) and by total size, least recently used first.
+class FeatureCache:
+
+    def __init__(self, directory, max_bytes=None, max_age=None):
+        self.directory = directory
+        self.max_bytes = max_bytes              # Maximum total size of the entries in bytes
+        self.max_age = max_age                  # Maximum time in seconds since an entry was last used
+        os.makedirs(directory, exist_ok=True)
+        self.index_file = os.path.join(directory, 'index.json')
+        self.index = {}
+        if os.path.exists(self.index_file):
+            with open(self.index_file) as f:
+                self.index = json.load(f)
+        self.n_hits = 0
+        self.n_misses = 0
+
+    # Function for hashing the content of a file (reused from the index while the file does not change)
+    def file_hash(self, path):
+        stat = os.stat(path)
+        name = os.path.abspath(path)
+        entry = self.index.get(name)
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            return entry['hash']
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        self.index[name] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': h.hexdigest()}
+        self.save_index()
+        return h.hexdigest()
+
+    def save_index(self):
+        tmp = self.index_file + '.{}.tmp'.format(os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp, self.index_file)
+
+    # Function for building the key of a recording for the given feature parameters
+    def key(self, path, params=None):
+        h = hashlib.sha256()
+        for name in content_files(path):
+            if os.path.basename(name) == 'header.json':
+                # Only the parts of the header that change the data (not the session timestamps)
+                with open(name) as f:
+                    header = json.load(f)
+                fields = [header['dtype'], header['channels'], header['conditions']]
+                if header.get('scales'):
+                    fields.append(header['scales'])
+                h.update(json.dumps(fields).encode())
+            else:
+                h.update(self.file_hash(name).encode())
+        h.update(json.dumps(params or {}, sort_keys=True).encode())
+        h.update(str(FEATURE_VERSION).encode())
+        return h.hexdigest()[:32]
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key + '.npy')
+
+    # Function for getting a cached feature table (None if it is not in the cache)
+    def get(self, key):
+        path = self.entry_path(key)
+        if not os.path.exists(path):
+            return None
+        os.utime(path)                          # Last use, for eviction
+        return np.load(path)
+
+    # Function for storing a feature table
+    def put(self, key, features):
+        path = self.entry_path(key)
+        tmp = path + '.{}.tmp'.format(os.getpid())
+        with open(tmp, 'wb') as f:
+            np.save(f, np.asarray(features))
+        os.replace(tmp, path)
+        self.evict()
+
+    # Function for getting the feature table of a recording, calculating it only if the recording, the
+    # parameters or the feature version changed
+    def features(self, path, compute=recording_features, params=None):
+        key = self.key(path, params)
+        features = self.get(key)
+        if features is None:
+            self.n_misses += 1
+            features = compute(path)
+            self.put(key, features)
+        else:
+            self.n_hits += 1
+        return features
+
+    # Function for listing the entries as (path, size, last use) sorted from the least recently used
+    def entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npy'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((os.path.join(self.directory, name), stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda e: e[2])
+
+    # Function for removing the entries older than max_age and the least recently used ones above max_bytes.
+    # Returns the number of removed entries.
+    def evict(self):
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+        now = time.time()
+        removed = 0
+        for path, size, last_use in entries:
+            too_old = self.max_age is not None and now - last_use > self.max_age
+            too_big = self.max_bytes is not None and total > self.max_bytes
+            if not (too_old or too_big):
+                continue
+            os.remove(path)
+            total -= size
+            removed += 1
+        return removed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Feature cache statistics and eviction')
+    parser.add_argument('directory', help='Cache directory')
+    parser.add_argument('--max-size', type=float, help='Maximum size in MB')
+    parser.add_argument('--max-age', type=float, help='Maximum time in days since an entry was last used')
+    args = parser.parse_args()
+
+    cache = FeatureCache(args.directory, None if args.max_size is None else args.max_size * 2**20,
+                         None if args.max_age is None else args.max_age * 86400)
+    removed = cache.evict()
+    entries = cache.entries()
+    print("{} entries, {:.2f} MB ({} removed)".format(len(entries), sum(e[1] for e in entries) / 2**20, removed))
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
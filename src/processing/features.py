@@ -0,0 +1,233 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Batched feature extraction for windows of mobile sensor data
+#------------------------------------------------------------------------------------------------------------------
+from functools import lru_cache
+
+import numpy as np
+from scipy.fft import rfft, rfftfreq
+
+# Version of the feature set (increase it whenever a change modifies the values of the features, so cached
+# features are recalculated)
+FEATURE_VERSION = 1
+
+# Features calculated for each axis (in the same order as in activity_data.txt)
+AXIS_FEATURES = ('mean', 'std', 'kurtosis', 'skew', 'fft_dc', 'fft_mean', 'fft_std', 'max', 'min')
+
+# Feature sets: 'basic' is the 55 features of activity_data.txt, 'extended' adds the spectral bank after them
+# (so the columns of the basic features do not change)
+FEATURE_SETS = ('basic', 'extended')
+
+# Spectral bank of the extended set, calculated for each axis from the rfft of the window: energy in each
+# frequency band of SPECTRAL_BANDS (Hz), dominant frequency and normalized spectral entropy. It is followed by
+# the correlation of every pair of axes.
+SPECTRAL_BANDS = ((0.5, 2.5), (2.5, 4.5), (4.5, 6.5), (6.5, np.inf))
+AXIS_SPECTRAL_FEATURES = tuple('band{}'.format(i + 1) for i in range(len(SPECTRAL_BANDS))) + ('dom_freq', 'spec_entropy')
+
+# Function for building the names of the feature columns for the given axes
+def feature_names(axis_names, feature_set='basic'):
+    names = []
+    for a in axis_names:
+        names += ['{}_{}'.format(a, f) for f in AXIS_FEATURES]
+    names.append('rms')
+    if feature_set == 'extended':
+        for a in axis_names:
+            names += ['{}_{}'.format(a, f) for f in AXIS_SPECTRAL_FEATURES]
+        n_axes = len(axis_names)
+        names += ['corr_{}_{}'.format(axis_names[i], axis_names[j]) for i in range(n_axes) for j in range(i + 1, n_axes)]
+    return names
+
+# Function for getting the number of feature columns of a feature set
+def feature_count(n_axes, feature_set='basic'):
+    n_basic = len(AXIS_FEATURES)*n_axes + 1
+    if feature_set == 'extended':
+        return n_basic + len(AXIS_SPECTRAL_FEATURES)*n_axes + n_axes*(n_axes - 1) // 2
+    return n_basic
+
+# Function for calculating the weights that map the rfft bins to the bins of the full (two-sided) fft.
+# For a real signal |fft[k]| == |fft[n-k]|, so every bin except DC (and Nyquist for even n) appears twice.
+def spectrum_weights(n_samples):
+    n_bins = n_samples // 2 + 1
+    weights = np.full(n_bins, 2.)
+    weights[0] = 1.
+    if n_samples % 2 == 0:
+        weights[-1] = 1.
+    return weights
+
+# Function for getting the frequency of each rfft bin and the weights that give the energy of each band of
+# SPECTRAL_BANDS from the squared magnitudes of the bins (mean power, so the bands of the whole spectrum add
+# up to the variance of the window). Calculated once for each window length.
+@lru_cache(maxsize=None)
+def spectral_bins(n_samples, sampling_rate):
+    freqs = rfftfreq(n_samples, 1. / sampling_rate)
+    weights = spectrum_weights(n_samples) / n_samples**2
+    band_weights = np.array([weights * ((freqs >= lo) & (freqs < hi)) for lo, hi in SPECTRAL_BANDS])
+    freqs.flags.writeable = False
+    band_weights.flags.writeable = False
+    return freqs, band_weights
+
+# Function for calculating the spectral bank of the extended feature set from the complex rfft of the
+# windows, of shape (n_windows, n_bins, n_axes). Returns an array of shape (n_windows, n_columns) with the
+# per-axis features (in the order of AXIS_SPECTRAL_FEATURES for each axis) followed by the correlation of
+# every pair of axes. Features of constant signals are NaN, as their skewness and kurtosis.
+def spectral_features(spectrum, n_samples, sampling_rate=20):
+    n_windows, n_bins, n_axes = spectrum.shape
+    freqs, band_weights = spectral_bins(n_samples, sampling_rate)
+    weights = spectrum_weights(n_samples)[1:] / n_samples**2
+
+    # Power of each bin (DC excluded): the contribution of each frequency to the variance
+    ac = spectrum[:, 1:, :]
+    power = ac.real**2 + ac.imag**2
+    bands = np.einsum('bk,wka->wab', band_weights[:, 1:], power)
+    power *= weights[:, np.newaxis]
+    variance = np.sum(power, axis=1)
+
+    # Cross-power of every pair of axes (Parseval), giving the covariance matrix of each window
+    covariance = np.einsum('k,wka,wkb->wab', weights, ac, np.conj(ac)).real
+
+    mean = spectrum[:, 0, :].real / n_samples
+    with np.errstate(divide='ignore', invalid='ignore'):
+        zero = variance <= (np.finfo(variance.dtype).resolution * mean)**2     # Constant signals
+        dom_freq = np.where(zero, np.nan, freqs[1:][np.argmax(power, axis=1)])
+        p = power / variance[:, np.newaxis, :]
+        entropy = -np.sum(np.where(p > 0, p * np.log(p), 0.), axis=1) / np.log(n_bins - 1)
+        entropy = np.where(zero, np.nan, entropy)
+        std = np.sqrt(np.where(zero, np.nan, variance))
+        i, j = np.triu_indices(n_axes, 1)
+        correlation = covariance[:, i, j] / (std[:, i] * std[:, j])
+
+    per_axis = np.concatenate((np.where(zero[:, :, np.newaxis], np.nan, bands), dom_freq[:, :, np.newaxis],
+                               entropy[:, :, np.newaxis]), axis=2)
+    return np.hstack((per_axis.reshape(n_windows, -1), correlation))
+
+# Function for calculating the central moments (variance, 3rd and 4th moments) of centered windows
+def central_moments(centered):
+    m2 = np.mean(centered**2, axis=1)
+    m3 = np.mean(centered**3, axis=1)
+    m4 = np.mean(centered**4, axis=1)
+    return m2, m3, m4
+
+# Function for calculating skewness and kurtosis from the central moments (same definition as
+# scipy.stats.skew and scipy.stats.kurtosis with their default arguments)
+def shape_statistics(mean, m2, m3, m4):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        zero = m2 <= (np.finfo(m2.dtype).resolution * mean)**2     # Constant signals
+        skew = np.where(zero, np.nan, m3 / m2**1.5)
+        kurt = np.where(zero, np.nan, m4 / m2**2 - 3.)
+    return skew, kurt
+
+# Function for calculating the features of a stack of windows.
+#   windows: array of shape (n_windows, n_samples, n_axes)
+#   feature_set: 'basic' or 'extended' (see FEATURE_SETS); sampling_rate (Hz) sets the frequency axis of
+#   the spectral bank
+#   Returns an array of shape (n_windows, feature_count(n_axes, feature_set)) with the columns in the order
+#   of feature_names().
+def extract_features(windows, feature_set='basic', sampling_rate=20):
+    windows = np.asarray(windows, dtype='float64')
+    if windows.ndim == 2:
+        windows = windows[np.newaxis]
+
+    # Statistical descriptors (moments share the centered data)
+    mean = np.mean(windows, axis=1)
+    m2, m3, m4 = central_moments(windows - mean[:, np.newaxis, :])
+
+    return features_from_moments(windows, mean, m2, m3, m4, feature_set, sampling_rate)
+
+# Function for building the feature matrix of a stack of windows whose mean and central moments are
+# already known (e.g. kept up to date incrementally by the online engine)
+def features_from_moments(windows, mean, m2, m3, m4, feature_set='basic', sampling_rate=20):
+    n_windows, n_samples, n_axes = windows.shape
+    skew, kurt = shape_statistics(mean, m2, m3, m4)
+
+    # Spectral descriptors from a single rfft along the sample axis (shared with the spectral bank)
+    complex_spectrum = rfft(windows, axis=1)
+    spectrum = np.abs(complex_spectrum)
+    weights = spectrum_weights(n_samples)[:, np.newaxis]
+    fft_mean = np.sum(weights * spectrum, axis=1) / n_samples
+    fft_var = np.sum(weights * spectrum**2, axis=1) / n_samples - fft_mean**2
+    fft_std = np.sqrt(np.maximum(fft_var, 0.))
+
+    # Build feature matrix (one block of 9 features per axis, followed by the rms of all axes)
+    per_axis = np.stack((mean, np.sqrt(np.maximum(m2, 0.)), kurt, skew, spectrum[:, 0, :], fft_mean, fft_std,
+                         np.max(windows, axis=1), np.min(windows, axis=1)), axis=1)
+    n_basic = len(AXIS_FEATURES)*n_axes + 1
+    features = np.empty((n_windows, feature_count(n_axes, feature_set)))
+    features[:, :n_basic - 1] = per_axis.transpose(0, 2, 1).reshape(n_windows, -1)
+    features[:, n_basic - 1] = np.sqrt(np.sum(windows**2, axis=(1, 2)))
+    if feature_set == 'extended':
+        features[:, n_basic:] = spectral_features(complex_spectrum, n_samples, sampling_rate)
+
+    return features
+
+# Function for calculating only some of the features of a stack of windows (e.g. the features kept by a
+# feature selection). Moments, spectra and extremes are only calculated for the axes that need them.
+#   indices: columns of the full feature matrix (as in feature_names(), basic or extended) to calculate
+#   moments: optional (mean, m2, m3, m4) of every axis, each of shape (n_windows, n_axes), used instead of
+#   calculating them from the windows (e.g. kept up to date incrementally by the online engine)
+#   Returns an array of shape (n_windows, len(indices)), equal to
+#   extract_features(windows, 'extended', sampling_rate)[:, indices].
+def extract_selected_features(windows, indices, sampling_rate=20, moments=None):
+    windows = np.asarray(windows, dtype='float64')
+    if windows.ndim == 2:
+        windows = windows[np.newaxis]
+    n_windows, n_samples, n_axes = windows.shape
+    indices = np.asarray(indices, dtype='int64')
+    axis, kind = np.divmod(indices, len(AXIS_FEATURES))
+    is_rms = indices == len(AXIS_FEATURES)*n_axes
+    is_extended = indices > len(AXIS_FEATURES)*n_axes
+
+    # Axes for which some basic features of the given kinds are needed
+    def axes_for(*kinds):
+        return np.unique(axis[~is_rms & ~is_extended & np.isin(kind, kinds)])
+
+    values = {}     # (axis, kind): feature values
+    def store(axes, kinds, columns):
+        for k, v in zip(kinds, columns):
+            for j, a in enumerate(axes):
+                values[(a, k)] = v[:, j]
+
+    # Statistical descriptors
+    axes = axes_for(0, 1, 2, 3)
+    if len(axes):
+        if moments is not None:
+            mean, m2, m3, m4 = (np.asarray(m, dtype='float64').reshape(n_windows, n_axes)[:, axes] for m in moments)
+        else:
+            x = windows[:, :, axes]
+            mean = np.mean(x, axis=1)
+            m2, m3, m4 = central_moments(x - mean[:, np.newaxis, :])
+        skew, kurt = shape_statistics(mean, m2, m3, m4)
+        store(axes, (0, 1, 2, 3), (mean, np.sqrt(np.maximum(m2, 0.)), kurt, skew))
+
+    # Spectral descriptors (the spectral bank needs the rfft of every axis, which is then shared)
+    complex_spectrum = rfft(windows, axis=1) if np.any(is_extended) else None
+    if complex_spectrum is not None:
+        bank = spectral_features(complex_spectrum, n_samples, sampling_rate)
+    axes = axes_for(4, 5, 6)
+    if len(axes):
+        if complex_spectrum is not None:
+            spectrum = np.abs(complex_spectrum[:, :, axes])
+        else:
+            spectrum = np.abs(rfft(windows[:, :, axes], axis=1))
+        weights = spectrum_weights(n_samples)[:, np.newaxis]
+        fft_mean = np.sum(weights * spectrum, axis=1) / n_samples
+        fft_var = np.sum(weights * spectrum**2, axis=1) / n_samples - fft_mean**2
+        store(axes, (4, 5, 6), (spectrum[:, 0, :], fft_mean, np.sqrt(np.maximum(fft_var, 0.))))
+
+    # Extremes
+    axes = axes_for(7, 8)
+    if len(axes):
+        x = windows[:, :, axes]
+        store(axes, (7, 8), (np.max(x, axis=1), np.min(x, axis=1)))
+
+    features = np.empty((n_windows, len(indices)))
+    for i in range(len(indices)):
+        if is_extended[i]:
+            features[:, i] = bank[:, indices[i] - len(AXIS_FEATURES)*n_axes - 1]
+        elif is_rms[i]:
+            features[:, i] = np.sqrt(np.sum(windows**2, axis=(1, 2)))
+        else:
+            features[:, i] = values[(axis[i], kind[i])]
+    return features
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
@@ -0,0 +1,115 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Real-time plot of sensor data with matplotlib blitting
+#------------------------------------------------------------------------------------------------------------------
+import time
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+from acquisition.ring_buffer import RingBuffer
+
+# Real-time plot of the last seconds of a ring buffer (channel 0 is time).
+# The lines are created once and only their data is replaced on each frame. Frames are drawn with
+# blitting: the static parts of the figure (axes, ticks, labels) are rendered once and saved as a
+# background, and each frame restores that background and draws only the lines and the label on top.
+# The x axis is the time relative to the last sample, so it never changes; the y limits are checked
+# every autoscale_interval seconds and the whole figure is redrawn only when they have to change.
+# Frames are driven by a timer of the figure, independently of how often the buffer is filled.
+#   groups: list of (axis label, channel indices, line names), one subplot per group
+#   label: function returning the text shown above the plots (e.g. the predicted activity), or None
+class LivePlot:
+
+    def __init__(self, buffer, groups, window_time=10., interval=0.05, autoscale_interval=1., label=None,
+                 max_points=2000):
+        self.buffer = buffer
+        self.groups = groups
+        self.window_time = window_time
+        self.autoscale_interval = autoscale_interval
+        self.label = label
+        self.max_points = max_points            # Maximum number of points drawn per line (decimation)
+
+        self.fig, axes = plt.subplots(len(groups), sharex=True, squeeze=False)
+        self.axes = axes[:, 0]
+        self.lines = []
+        for ax, (ylabel, channels, names) in zip(self.axes, groups):
+            self.lines.append([ax.plot([], [], label=name, animated=True)[0] for name in names])
+            ax.set_xlim(-window_time, 0)
+            ax.set_ylim(-1, 1)
+            ax.set_ylabel(ylabel)
+            ax.legend(loc='upper left', fontsize='small')
+        self.axes[-1].set_xlabel("Time (s)")
+        self.label_text = self.fig.text(0.5, 0.98, '', ha='center', va='top', fontsize=14, animated=True)
+        self.fig.tight_layout(rect=(0, 0, 1, 0.94))
+
+        self.background = None
+        self.last_autoscale = 0.
+        self.n_frames = 0
+        self.n_redraws = 0
+        self.fig.canvas.mpl_connect('draw_event', self.on_draw)
+        self.timer = self.fig.canvas.new_timer(interval=int(interval * 1000))
+        self.timer.add_callback(self.update)
+
+    # Function for saving the background after a full redraw (first draw, resize or new limits)
+    def on_draw(self, event):
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self.draw_artists()
+
+    def draw_artists(self):
+        for lines in self.lines:
+            for line in lines:
+                self.fig.draw_artist(line)
+        self.fig.draw_artist(self.label_text)
+
+    # Function for drawing a frame
+    def update(self):
+        data = RingBuffer.join(self.buffer.last_seconds(self.window_time))
+        if len(data) < 2 or self.background is None:
+            return
+        data = data[::max(1, len(data) // self.max_points)]
+        t = data[:, 0] - data[-1, 0]
+        for lines, (ylabel, channels, names) in zip(self.lines, self.groups):
+            for line, c in zip(lines, channels):
+                line.set_data(t, data[:, c])
+        if self.label is not None:
+            self.label_text.set_text(self.label())
+        self.n_frames += 1
+
+        now = time.perf_counter()
+        if now - self.last_autoscale >= self.autoscale_interval:
+            self.last_autoscale = now
+            if self.autoscale(data):
+                self.n_redraws += 1
+                self.fig.canvas.draw()          # on_draw() saves the new background and draws the lines
+                return
+
+        canvas = self.fig.canvas
+        canvas.restore_region(self.background)
+        self.draw_artists()
+        canvas.blit(self.fig.bbox)
+        canvas.flush_events()
+
+    # Function for updating the y limits of each subplot. The limits grow as soon as the data leaves them and
+    # shrink when the limits fitted to the data would be less than half as wide (limits that were just fitted
+    # never shrink again for the same data). Returns True if any limit changed.
+    def autoscale(self, data):
+        changed = False
+        for ax, (ylabel, channels, names) in zip(self.axes, self.groups):
+            lo, hi = np.min(data[:, channels]), np.max(data[:, channels])
+            margin = 0.1 * (hi - lo) + 0.5
+            limits = (lo - margin, hi + margin)
+            y0, y1 = ax.get_ylim()
+            if lo < y0 or hi > y1 or limits[1] - limits[0] < 0.5 * (y1 - y0):
+                if limits != (y0, y1):
+                    ax.set_ylim(*limits)
+                    changed = True
+        return changed
+
+    # Function for showing the plot (blocks until the window is closed)
+    def show(self):
+        self.timer.start()
+        plt.show()
+        self.timer.stop()
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
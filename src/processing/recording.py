@@ -0,0 +1,248 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Chunked, memory-mappable recording format
+#------------------------------------------------------------------------------------------------------------------
+import os
+import json
+import pickle
+from datetime import datetime
+
+import numpy as np
+
+# A recording is a directory (name.rec) with three files:
+#   header.json   format version, sample dtype, channel names, condition names, sessions and totals, and
+#                 the scale of each channel for int16 samples
+#   samples.bin   raw little-endian array of shape (n_samples, n_channels), appended session after session
+#   windows.bin   int64 array of shape (n_windows, 4) with (start, stop, condition_id, session) per window,
+#                 where start and stop are row offsets in samples.bin
+# Both binary files are only ever appended to, so new sessions do not rewrite old data. The header is
+# written last and holds the totals, so a reader never sees a partially appended session.
+# Samples are stored as float64, float32 or int16. int16 samples are quantized with a fixed scale per
+# channel (value = stored integer * scale) and decoded to float32 when they are read; the time channel of
+# raw recordings cannot be quantized (float32 keeps it to about 0.1 ms for the first half hour).
+FORMAT_VERSION = 1
+WINDOW_FIELDS = ('start', 'stop', 'condition_id', 'session')
+SAMPLE_DTYPES = ('float64', 'float32', 'int16')
+
+# Full-scale range of the sensor channels stored as int16 (m/s^2 for acc, rad/s for gyro): steps of about
+# 5 mm/s^2 and 1 mrad/s
+CHANNEL_RANGES = {'acc': 160., 'gyro': 35.}
+
+# Function for getting the int16 scale of each channel from CHANNEL_RANGES
+def default_scales(channels):
+    scales = []
+    for c in channels:
+        prefix = next((p for p in CHANNEL_RANGES if c.startswith(p)), None)
+        if prefix is None:
+            raise ValueError('Channel {} cannot be stored as int16 (no range in CHANNEL_RANGES)'.format(c))
+        scales.append(CHANNEL_RANGES[prefix] / np.iinfo('int16').max)
+    return scales
+
+class Recording:
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'header.json')) as f:
+            self.header = json.load(f)
+        self.dtype = np.dtype(self.header['dtype']).newbyteorder('<')
+        self.channels = self.header['channels']
+        self.conditions = {int(k): v for k, v in self.header['conditions'].items()}
+        self.scales = np.asarray(self.header['scales'], dtype='float32') if self.header.get('scales') else None
+        self.cached_samples = None
+        self.cached_windows = None
+
+    # Function for creating an empty recording (int16 recordings use the scales of default_scales() unless
+    # other scales are given)
+    @staticmethod
+    def create(path, channels, dtype='float64', conditions=None, scales=None):
+        if np.dtype(dtype).kind == 'i' and scales is None:
+            scales = default_scales(channels)
+        os.makedirs(path)
+        header = {'version': FORMAT_VERSION, 'dtype': np.dtype(dtype).str, 'channels': list(channels),
+                  'conditions': {str(k): v for k, v in (conditions or {}).items()},
+                  'n_samples': 0, 'n_windows': 0, 'sessions': []}
+        if scales is not None:
+            header['scales'] = [float(s) for s in scales]
+        for name in ('samples.bin', 'windows.bin'):
+            open(os.path.join(path, name), 'wb').close()
+        Recording.write_header(path, header)
+        return Recording(path)
+
+    # Function for opening a recording, creating it if it does not exist (an existing recording must have
+    # the given channels and dtype)
+    @staticmethod
+    def open(path, channels, dtype='float64', conditions=None, scales=None):
+        if os.path.exists(os.path.join(path, 'header.json')):
+            rec = Recording(path)
+            rec.check_layout(channels, dtype)
+            return rec
+        return Recording.create(path, channels, dtype, conditions, scales)
+
+    # Function for checking that samples with the given channels and dtype can be appended
+    def check_layout(self, channels, dtype):
+        if list(channels) != self.channels:
+            raise ValueError('{} has channels {}, not {}'.format(self.path, ', '.join(self.channels), ', '.join(channels)))
+        if np.dtype(dtype).newbyteorder('<') != self.dtype:
+            raise ValueError('{} stores {} samples, not {}'.format(self.path, self.dtype.name, np.dtype(dtype).name))
+
+    @staticmethod
+    def write_header(path, header):
+        tmp = os.path.join(path, 'header.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(header, f, indent=1)
+        os.replace(tmp, os.path.join(path, 'header.json'))
+
+    @property
+    def n_samples(self):
+        return self.header['n_samples']
+
+    @property
+    def n_windows(self):
+        return self.header['n_windows']
+
+    # Memory-mapped samples as stored (nothing is read until the rows are used; see decode())
+    @property
+    def samples(self):
+        if self.cached_samples is None or len(self.cached_samples) != self.n_samples:
+            self.cached_samples = self.map('samples.bin', self.dtype, (self.n_samples, len(self.channels)))
+        return self.cached_samples
+
+    # Memory-mapped window table
+    @property
+    def windows(self):
+        if self.cached_windows is None or len(self.cached_windows) != self.n_windows:
+            self.cached_windows = self.map('windows.bin', np.dtype('<i8'), (self.n_windows, len(WINDOW_FIELDS)))
+        return self.cached_windows
+
+    def map(self, name, dtype, shape):
+        if shape[0] == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(os.path.join(self.path, name), dtype=dtype, mode='r', shape=shape)
+
+    # Function for converting stored samples to values (int16 samples are scaled to float32, float samples
+    # are returned as they are)
+    def decode(self, rows):
+        if self.scales is None:
+            return rows
+        return rows * self.scales
+
+    # Function for converting values to the stored dtype
+    def encode(self, samples):
+        if self.scales is None:
+            return np.asarray(samples, dtype=self.dtype)
+        limit = np.iinfo(self.dtype).max
+        return np.clip(np.round(np.asarray(samples) / self.scales), -limit, limit).astype(self.dtype)
+
+    # Function for getting the condition IDs of all the windows
+    def condition_ids(self):
+        return np.asarray(self.windows[:, 2])
+
+    # Function for getting the condition names of all the windows
+    def labels(self):
+        return [self.conditions.get(int(c), str(c)) for c in self.condition_ids()]
+
+    # Function for getting the samples of window i (a view of the memory map, or decoded)
+    def window(self, i):
+        start, stop = self.windows[i, :2]
+        return self.decode(self.samples[start:stop])
+
+    # Function for stacking windows of equal length into an array of shape (n_windows, n_samples, n_channels).
+    # Only the rows of the selected windows are read from disk.
+    def stack(self, indices=None):
+        windows = self.windows if indices is None else self.windows[indices]
+        if len(windows) == 0:
+            return np.zeros((0, 0, len(self.channels)))
+        lengths = windows[:, 1] - windows[:, 0]
+        if np.any(lengths != lengths[0]):
+            raise ValueError('Windows of {} have different lengths'.format(self.path))
+        rows = windows[:, :1] + np.arange(lengths[0])
+        return self.decode(np.asarray(self.samples[rows]))
+
+    # Function for appending a session.
+    #   samples: array of shape (n, n_channels)
+    #   windows: array of shape (n_windows, 2) with (start, stop) offsets relative to the session samples
+    #   condition_ids: condition ID of each window
+    def append_session(self, samples, windows, condition_ids, source=None, conditions=None):
+        samples = self.check_samples(samples)
+        session = self.begin_session(source, conditions)
+        start = self.n_samples
+        self.append_samples(samples)
+        self.append_windows(np.asarray(windows, dtype='int64').reshape(-1, 2) + start, condition_ids)
+        return session
+
+    # Function for starting a session whose samples and windows are appended in blocks (streaming)
+    def begin_session(self, source=None, conditions=None):
+        for k, v in (conditions or {}).items():
+            self.header['conditions'][str(k)] = v
+        self.conditions = {int(k): v for k, v in self.header['conditions'].items()}
+        session = len(self.header['sessions'])
+        self.header['sessions'].append({'id': session, 'source': source, 'created': datetime.now().isoformat(),
+                                        'samples': [self.n_samples, self.n_samples],
+                                        'windows': [self.n_windows, self.n_windows]})
+        Recording.write_header(self.path, self.header)
+        return session
+
+    # Function for checking that samples are an array of shape (n, n_channels)
+    def check_samples(self, samples):
+        samples = np.atleast_2d(samples)
+        if samples.ndim != 2 or samples.shape[1] != len(self.channels):
+            raise ValueError('Samples of shape {} do not match the {} channels of {}'.format(samples.shape, len(self.channels), self.path))
+        return samples
+
+    # Function for appending samples (array of shape (n, n_channels)) to the last session
+    def append_samples(self, samples):
+        samples = self.encode(self.check_samples(samples))
+        self.append_rows('samples.bin', samples, self.n_samples * len(self.channels) * self.dtype.itemsize)
+        self.header['n_samples'] += len(samples)
+        self.header['sessions'][-1]['samples'][1] = self.n_samples
+        Recording.write_header(self.path, self.header)
+
+    # Function for appending windows to the last session (start and stop are offsets in samples.bin)
+    def append_windows(self, windows, condition_ids):
+        windows = np.asarray(windows, dtype='int64').reshape(-1, 2)
+        table = np.empty((len(windows), len(WINDOW_FIELDS)), dtype='<i8')
+        table[:, :2] = windows
+        table[:, 2] = condition_ids
+        table[:, 3] = len(self.header['sessions']) - 1
+        self.append_rows('windows.bin', table, self.n_windows * len(WINDOW_FIELDS) * 8)
+        self.header['n_windows'] += len(windows)
+        self.header['sessions'][-1]['windows'][1] = self.n_windows
+        Recording.write_header(self.path, self.header)
+
+    # Function for getting the samples of a session (a view of the memory map, or decoded)
+    def session_samples(self, session):
+        start, stop = self.header['sessions'][session]['samples']
+        return self.decode(self.samples[start:stop])
+
+    # Function for appending rows to a binary file (anything after the committed size is an interrupted
+    # append and is overwritten)
+    def append_rows(self, name, rows, committed_bytes):
+        with open(os.path.join(self.path, name), 'r+b') as f:
+            f.truncate(committed_bytes)
+            f.seek(committed_bytes)
+            f.write(np.ascontiguousarray(rows).tobytes())
+
+# Function for loading the windows of a recording (.rec) or of a legacy pickle file (.obj) as a list of
+# (condition, condition_id, window) tuples (the layout of the .obj files)
+def load_windows(path):
+    if os.path.isdir(path):
+        rec = Recording(path)
+        data = rec.stack()
+        return [(name, int(c), w) for name, c, w in zip(rec.labels(), rec.condition_ids(), data)]
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+# Function for writing a list of (condition, condition_id, window) tuples as a new session of a recording
+# (dtype of the samples, see SAMPLE_DTYPES; an existing recording must have the same channels and dtype)
+def save_windows(path, data, channels, source=None, dtype='float64'):
+    windows = [np.asarray(w) for c, i, w in data]
+    offsets = np.cumsum([0] + [len(w) for w in windows])
+    conditions = {int(i): c for c, i, w in data}
+    rec = Recording.open(path, channels, dtype, conditions=conditions)
+    samples = np.vstack(windows) if windows else np.zeros((0, len(channels)))
+    rec.append_session(samples, np.column_stack((offsets[:-1], offsets[1:])), [int(i) for c, i, w in data],
+                       source=source, conditions=conditions)
+    return rec
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
@@ -0,0 +1,65 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Vectorized resampling of raw sensor data to uniformly sampled windows
+#------------------------------------------------------------------------------------------------------------------
+import numpy as np
+from scipy import signal
+
+# Function for removing repeated and out of order timestamps (polling returns the same sample several
+# times). The first sample of each timestamp is kept.
+def dedupe_timestamps(t, x):
+    t = np.asarray(t, dtype='float64')
+    if len(t) < 2:
+        return t, np.asarray(x)
+    keep = np.concatenate(([True], t[1:] > np.maximum.accumulate(t)[:-1]))
+    return t[keep], np.asarray(x)[keep]
+
+# Function for building the uniform time grid of every window as one array of shape (n_windows, n_samples)
+# (the same grid as np.linspace(t_start, t_start + window_time, n_samples) for each window)
+def window_grid(t_starts, window_time, n_samples):
+    return np.asarray(t_starts, dtype='float64')[:, np.newaxis] + np.linspace(0., window_time, n_samples)
+
+# Function for linear interpolation of all the channels at once (same result as interp1d(kind='linear',
+# fill_value='extrapolate') for each channel).
+#   t: increasing time vector of shape (n,), x: samples of shape (n, n_channels)
+#   t_new: times of any shape. Returns an array of shape t_new.shape + (n_channels,).
+def interpolate(t, x, t_new):
+    t_new = np.asarray(t_new, dtype='float64')
+    x = np.asarray(x, dtype='float64')
+    if len(t) == 1:
+        return np.broadcast_to(x[0], t_new.shape + x.shape[1:]).copy()
+
+    # A single searchsorted pass, shared by all the channels
+    flat = t_new.ravel()
+    idx = np.clip(np.searchsorted(t, flat, side='right') - 1, 0, len(t) - 2)
+    w = ((flat - t[idx]) / (t[idx + 1] - t[idx]))[:, np.newaxis]
+    out = x[idx] * (1. - w) + x[idx + 1] * w
+    return out.reshape(t_new.shape + x.shape[1:])
+
+# Function for low-pass filtering raw data before it is sampled at output_rate (anti-aliasing).
+# The raw data is first interpolated to a uniform grid at its own average rate, then filtered forwards
+# and backwards (zero phase) with a Butterworth filter at 80% of the output Nyquist frequency.
+def antialias_filter(t, x, output_rate, order=4):
+    raw_rate = (len(t) - 1) / (t[-1] - t[0])
+    cutoff = 0.8 * output_rate / 2.
+    if cutoff >= raw_rate / 2.:
+        return t, x
+    t_uniform = np.linspace(t[0], t[-1], len(t))
+    x_uniform = interpolate(t, x, t_uniform)
+    sos = signal.butter(order, cutoff, fs=raw_rate, output='sos')
+    padlen = min(3 * (2 * len(sos) + 1), len(t_uniform) - 1)
+    return t_uniform, signal.sosfiltfilt(sos, x_uniform, axis=0, padlen=padlen)
+
+# Function for resampling raw data to uniformly sampled windows.
+#   t: time vector of shape (n,), x: samples of shape (n, n_channels)
+#   t_starts: start time of each window
+#   Returns an array of shape (n_windows, n_samples, n_channels).
+def resample_windows(t, x, t_starts, window_time, n_samples, dedupe=True, antialias=False):
+    if dedupe:
+        t, x = dedupe_timestamps(t, x)
+    if antialias:
+        t, x = antialias_filter(t, x, (n_samples - 1) / window_time)
+    return interpolate(t, x, window_grid(t_starts, window_time, n_samples))
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
@@ -0,0 +1,245 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Parallel cross-validation and hyperparameter sweeps (experiments of notebooks/ml_project1.ipynb)
+#------------------------------------------------------------------------------------------------------------------
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.svm import SVC
+from sklearn.model_selection import StratifiedKFold
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from training.feature_selection import rfe_ranking, rfe_support, kbest_scores, kbest_support, selection_path
+
+# Default processed data file (written by processing/data_processing.py)
+DATA_FILE = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'raw', 'activity_data.txt'))
+
+# Sweeps of the notebook: swept parameter, axis label and whether the values are numbers of features
+SWEEPS = {'gamma': ('Gamma', False),                        # SVC(kernel='rbf', gamma=value)
+          'C': ('Correction Factor (c)', False),            # SVC(kernel='linear', C=value)
+          'rfe': ('Number of Features Selected', True),     # RFE(SVC(kernel='linear'), value) + SVC(kernel='linear')
+          'kbest': ('Number of Features Selected', True)}   # SelectKBest(f_classif, value) + SVC(kernel='rbf')
+
+# Function for loading the processed data (label in the first column, features in the rest), either as text,
+# as a binary .npy file or as a dataset merged by processing/batch_processing.py (.npz)
+def load_dataset(path=DATA_FILE):
+    if path.endswith('.npz'):
+        with np.load(path) as f:
+            data = f['data']
+    else:
+        data = np.load(path) if path.endswith('.npy') else np.loadtxt(path)
+    return data[:, 1:], data[:, 0]
+
+# Function for getting the default values of a sweep (the ranges used in the notebook)
+def default_values(sweep, n_features):
+    if SWEEPS[sweep][1]:
+        return np.arange(1, n_features)
+    return np.linspace(0.000001, 0.001, 1000)
+
+# Cross-validation folds with the per-fold state that does not depend on the swept parameter.
+# The scaler of every fold is fitted once (in the main process, before the workers start), and the RFE
+# ranking and SelectKBest scores of a fold are calculated once and reused for every number of features.
+# With a cache directory they are also kept on disk, under a key of the data and the fold settings, so
+# later runs reuse them.
+class FoldCache:
+
+    def __init__(self, x, y, n_folds=5, seed=0, scale=False, cache_dir=None):
+        self.x = x
+        self.y = y
+        self.n_folds = n_folds
+        self.scale = scale
+        self.splits = list(StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=seed).split(x, y))
+
+        self.cache_dir = None
+        if cache_dir:
+            key = hashlib.sha1(x.tobytes() + y.tobytes() + repr((n_folds, seed, scale)).encode()).hexdigest()[:16]
+            self.cache_dir = os.path.join(cache_dir, key)
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.scalers = [self.fit_scaler(fold) for fold in range(n_folds)]
+        self.rankings = {}
+        self.scores = {}
+        self.fold_data = {}
+
+    # Function for getting the path of a cached array (None without a cache directory)
+    def cache_path(self, name):
+        return os.path.join(self.cache_dir, name + '.npy') if self.cache_dir else None
+
+    # Function for loading a cached array, or computing and caching it
+    def cached(self, name, compute):
+        path = self.cache_path(name)
+        if path and os.path.exists(path):
+            return np.load(path)
+        value = compute()
+        if path:
+            tmp = path + '.{}.tmp'.format(os.getpid())
+            with open(tmp, 'wb') as f:
+                np.save(f, value)
+            os.replace(tmp, path)
+        return value
+
+    # Function for fitting the scaler of a fold. Returns the (mean, scale) of each feature.
+    def fit_scaler(self, fold):
+        n_features = self.x.shape[1]
+        if not self.scale:
+            return np.zeros(n_features), np.ones(n_features)
+        def fit():
+            scaler = StandardScaler().fit(self.x[self.splits[fold][0]])
+            return np.vstack((scaler.mean_, scaler.scale_))
+        mean, scale = self.cached('scaler_{}'.format(fold), fit)
+        return mean, scale
+
+    # Function for getting the scaled (x_train, y_train, x_test, y_test) of a fold
+    def data(self, fold):
+        if fold not in self.fold_data:
+            train_index, test_index = self.splits[fold]
+            mean, scale = self.scalers[fold]
+            self.fold_data[fold] = ((self.x[train_index] - mean) / scale, self.y[train_index],
+                                    (self.x[test_index] - mean) / scale, self.y[test_index])
+        return self.fold_data[fold]
+
+    # Function for getting the full RFE ranking of a fold (linear SVC, one feature eliminated per step)
+    def rfe_ranking(self, fold):
+        if fold not in self.rankings:
+            x_train, y_train = self.data(fold)[:2]
+            self.rankings[fold] = self.cached('rfe_{}'.format(fold), lambda: rfe_ranking(x_train, y_train))
+        return self.rankings[fold]
+
+    # Function for getting the SelectKBest (f_classif) scores of a fold
+    def kbest_scores(self, fold):
+        if fold not in self.scores:
+            x_train, y_train = self.data(fold)[:2]
+            self.scores[fold] = self.cached('kbest_{}'.format(fold), lambda: kbest_scores(x_train, y_train))
+        return self.scores[fold]
+
+# Function for evaluating a group of parameter values on one fold. Returns the predictions for the test
+# samples of the fold, one row per value.
+def evaluate(cache, sweep, fold, values):
+    x_train, y_train, x_test, y_test = cache.data(fold)
+    if sweep == 'rfe':
+        ranking = cache.rfe_ranking(fold)
+        return selection_path(x_train, y_train, x_test, values, lambda n: rfe_support(ranking, n),
+                              lambda: SVC(kernel='linear'))
+    if sweep == 'kbest':
+        scores = cache.kbest_scores(fold)
+        return selection_path(x_train, y_train, x_test, values, lambda k: kbest_support(scores, k),
+                              lambda: SVC(kernel='rbf'))
+
+    y_pred = np.empty((len(values), len(y_test)))
+    for i, value in enumerate(values):
+        if sweep == 'gamma':
+            clf = SVC(kernel='rbf', gamma=value).fit(x_train, y_train)
+            y_pred[i] = clf.predict(x_test)
+        elif sweep == 'C':
+            clf = SVC(kernel='linear', C=value).fit(x_train, y_train)
+            y_pred[i] = clf.predict(x_test)
+    return y_pred
+
+# Fold cache of the worker processes (sent once per worker instead of once per job)
+worker_cache = None
+
+def init_worker(cache):
+    global worker_cache
+    worker_cache = cache
+
+def run_job(sweep, fold, values):
+    return evaluate(worker_cache, sweep, fold, values)
+
+# Function for running a sweep. Every fold x group of values is a separate job; with n_jobs > 1 the jobs
+# are spread over a process pool. Returns the cross-validated predictions, one row per value (the test
+# predictions of all the folds, as in the notebook).
+def run_sweep(cache, sweep, values, n_jobs=1, chunks_per_job=4):
+    values = np.asarray(values)
+    n_groups = min(len(values), max(1, int(np.ceil(chunks_per_job * n_jobs / cache.n_folds))))
+    if SWEEPS[sweep][1]:
+        n_groups = 1                # One job per fold: its ranking is calculated once for all the sizes
+    groups = np.array_split(np.arange(len(values)), n_groups)
+    jobs = [(fold, group) for fold in range(cache.n_folds) for group in groups]
+
+    y_pred = np.empty((len(values), len(cache.y)))
+    if n_jobs == 1:
+        init_worker(cache)
+        results = (run_job(sweep, fold, values[group]) for fold, group in jobs)
+    else:
+        pool = ProcessPoolExecutor(max_workers=n_jobs, initializer=init_worker, initargs=(cache,))
+        results = pool.map(run_job, [sweep] * len(jobs), [f for f, g in jobs], [values[g] for f, g in jobs])
+    for (fold, group), pred in zip(jobs, results):
+        y_pred[group[:, np.newaxis], cache.splits[fold][1]] = pred
+    if n_jobs != 1:
+        pool.shutdown()
+    return y_pred
+
+# Function for calculating the accuracy and the recall of each class for every row of predictions
+def score_curves(y, y_pred):
+    classes = np.unique(y)
+    accuracy = np.mean(y_pred == y, axis=1)
+    recalls = np.column_stack([np.mean(y_pred[:, y == c] == c, axis=1) for c in classes])
+    return classes, accuracy, recalls
+
+# Function for plotting the curves of a sweep as in the notebook
+def plot_curves(path, sweep, values, classes, accuracy, recalls):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    for i, c in enumerate(classes):
+        plt.plot(values, recalls[:, i], label='recall of class {}'.format(int(c)))
+    plt.plot(values, accuracy, label='accuracy')
+    plt.xlabel(SWEEPS[sweep][0])
+    plt.ylabel('score')
+    plt.title('Model Performance vs {}'.format(SWEEPS[sweep][0]))
+    plt.legend()
+    if not SWEEPS[sweep][1]:
+        plt.xscale('log')
+    plt.grid(True)
+    plt.savefig(path)
+    plt.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cross-validated hyperparameter and feature selection sweeps')
+    parser.add_argument('sweep', choices=sorted(SWEEPS), help='Sweep to run')
+    parser.add_argument('--data', default=DATA_FILE, help='Processed data file (default: data/raw/activity_data.txt)')
+    parser.add_argument('--values', type=float, nargs=3, metavar=('START', 'STOP', 'NUM'), help='Swept values as in np.linspace (default: the notebook ranges)')
+    parser.add_argument('--folds', type=int, default=5, help='Number of cross-validation folds')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the fold shuffling')
+    parser.add_argument('--scale', action='store_true', help='Standardize the features (scaler fitted on the training data of each fold)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='Number of worker processes')
+    parser.add_argument('--cache', help='Directory for caching fitted scalers, RFE rankings and SelectKBest scores between runs')
+    parser.add_argument('--output', default='sweep_{}.json', help='JSON file for the curves ({} is replaced with the sweep name)')
+    parser.add_argument('--plot', help='Image file for the curves')
+    args = parser.parse_args()
+
+    x, y = load_dataset(args.data)
+    values = default_values(args.sweep, x.shape[1])
+    if args.values:
+        values = np.linspace(args.values[0], args.values[1], int(args.values[2]))
+        if SWEEPS[args.sweep][1]:
+            values = np.unique(np.round(values).astype(int))
+
+    start = time.perf_counter()
+    cache = FoldCache(x, y, args.folds, args.seed, args.scale, args.cache)
+    y_pred = run_sweep(cache, args.sweep, values, args.jobs)
+    classes, accuracy, recalls = score_curves(y, y_pred)
+    elapsed = time.perf_counter() - start
+
+    best = int(np.argmax(accuracy))
+    print("{} sweep: {} values x {} folds in {:.1f} s ({} jobs)".format(args.sweep, len(values), args.folds, elapsed, args.jobs))
+    print("Best {} = {:g} (accuracy {:.3f})".format(args.sweep, values[best], accuracy[best]))
+
+    results = {'sweep': args.sweep, 'parameter': SWEEPS[args.sweep][0], 'folds': args.folds, 'seed': args.seed,
+               'scale': args.scale, 'elapsed': elapsed, 'values': values.tolist(), 'accuracy': accuracy.tolist(),
+               'recall': {str(int(c)): recalls[:, i].tolist() for i, c in enumerate(classes)}}
+    with open(args.output.format(args.sweep), 'w') as f:
+        json.dump(results, f, indent=1)
+    if args.plot:
+        plot_curves(args.plot, args.sweep, values, classes, accuracy, recalls)
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
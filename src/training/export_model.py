@@ -0,0 +1,72 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Training and export of the linear model used by the online classifier
+#------------------------------------------------------------------------------------------------------------------
+import os
+import sys
+import argparse
+
+import numpy as np
+from sklearn.svm import SVC
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from processing.features import feature_count, feature_names
+from training.experiments import DATA_FILE, load_dataset
+from training.feature_selection import rfe_ranking, rfe_support
+from online.linear_model import MODEL_VERSION, LinearModel
+
+# Conditions of the experiments (condition IDs are the class labels in activity_data.txt)
+CONDITIONS = {1: 'Nothing', 2: 'Jump', 3: 'Run', 4: 'Walk', 5: 'Squat', 6: 'JumpingJack'}
+AXES = ('accX', 'accY', 'accZ', 'gyroX', 'gyroY', 'gyroZ')
+
+# Function for training the model of the notebook (RFE with a linear SVC, then a linear SVC on the selected
+# features). sampling_rate is the one of the windows the features were calculated from. Returns the arrays
+# of the model file.
+def train_model(x, y, n_features=10, C=1., scale=False, sampling_rate=20):
+    if scale:
+        scaler = StandardScaler().fit(x)
+        mean, std = scaler.mean_, scaler.scale_
+    else:
+        mean, std = np.zeros(x.shape[1]), np.ones(x.shape[1])
+    x_scaled = (x - mean) / std
+
+    selected = np.flatnonzero(rfe_support(rfe_ranking(x_scaled, y, SVC(kernel='linear', C=C)), n_features))
+    clf = SVC(kernel='linear', C=C).fit(x_scaled[:, selected], y)
+
+    # Pairs of classes of the one-vs-one decision functions, in the order used by libsvm
+    n_classes = len(clf.classes_)
+    pairs = np.array([(i, j) for i in range(n_classes) for j in range(i + 1, n_classes)], dtype='int64')
+
+    return clf, {'version': np.array(MODEL_VERSION), 'selected': selected, 'mean': mean[selected],
+                 'scale': std[selected], 'coef': clf.coef_, 'intercept': clf.intercept_, 'pairs': pairs,
+                 'classes': clf.classes_, 'class_names': np.array([CONDITIONS.get(int(c), str(c)) for c in clf.classes_]),
+                 'sampling_rate': np.array(float(sampling_rate)),
+                 'feature_set': np.array('extended' if x.shape[1] > feature_count(len(AXES)) else 'basic')}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train the linear SVC with RFE and export it for the online classifier')
+    parser.add_argument('--data', default=DATA_FILE, help='Processed data file (default: data/raw/activity_data.txt)')
+    parser.add_argument('--features', type=int, default=10, help='Number of features kept by RFE')
+    parser.add_argument('--C', type=float, default=1., help='Regularization parameter of the SVC')
+    parser.add_argument('--scale', action='store_true', help='Standardize the features before selection and training')
+    parser.add_argument('--sampling-rate', type=float, default=20, help='Sampling rate in Hz of the windows of the data')
+    parser.add_argument('--output', default='linear_model.npz', help='Model file')
+    args = parser.parse_args()
+
+    x, y = load_dataset(args.data)
+    clf, arrays = train_model(x, y, args.features, args.C, args.scale, args.sampling_rate)
+    np.savez(args.output, **arrays)
+
+    # Check the exported model against scikit-learn on the training data
+    model = LinearModel.load(args.output)
+    x_selected = x[:, model.selected]
+    agreement = np.mean(model.predict(x_selected) == clf.predict((x_selected - arrays['mean']) / arrays['scale']))
+    names = feature_names(AXES, model.feature_set)
+    print("Selected features: {}".format(', '.join(names[i] for i in model.selected)))
+    print("Training accuracy: {:.3f}".format(np.mean(model.predict(x_selected) == y)))
+    print("Agreement with scikit-learn: {:.3f}".format(agreement))
+    print("Model saved to {}".format(args.output))
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
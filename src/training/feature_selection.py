@@ -0,0 +1,46 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Feature selection paths (every number of features from one ranking)
+#------------------------------------------------------------------------------------------------------------------
+import numpy as np
+from sklearn.svm import SVC
+from sklearn.feature_selection import RFE, f_classif
+
+# Function for ranking the features with recursive feature elimination (linear SVC by default).
+# The elimination is run once, down to a single feature: with step=1, RFE(n_features_to_select=n) removes
+# the same features in the same order and stops earlier, so its selection is exactly ranking <= n.
+def rfe_ranking(x, y, estimator=None):
+    estimator = SVC(kernel='linear') if estimator is None else estimator
+    return RFE(estimator, n_features_to_select=1, step=1).fit(x, y).ranking_
+
+# Function for getting the features selected by RFE(n_features_to_select=n) from a full ranking
+def rfe_support(ranking, n):
+    return np.asarray(ranking) <= n
+
+# Function for calculating the ANOVA F scores of the features (the scores of SelectKBest(f_classif))
+def kbest_scores(x, y):
+    scores = f_classif(x, y)[0]
+    return np.where(np.isnan(scores), np.finfo(scores.dtype).min, scores)
+
+# Function for getting the features selected by SelectKBest(k=k) from precomputed scores (same tie
+# breaking as scikit-learn)
+def kbest_support(scores, k):
+    support = np.zeros(len(scores), dtype=bool)
+    if k > 0:
+        support[np.argsort(scores, kind='mergesort')[-k:]] = True
+    return support
+
+# Function for evaluating a classifier on the selected features for every size in sizes.
+#   support: function returning the feature mask for a size (e.g. lambda n: rfe_support(ranking, n))
+#   make_classifier: function returning a new (unfitted) classifier
+#   Returns the test predictions, one row per size.
+def selection_path(x_train, y_train, x_test, sizes, support, make_classifier):
+    y_pred = np.empty((len(sizes), len(x_test)))
+    for i, n in enumerate(sizes):
+        selected = support(int(n))
+        clf = make_classifier().fit(x_train[:, selected], y_train)
+        y_pred[i] = clf.predict(x_test[:, selected])
+    return y_pred
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
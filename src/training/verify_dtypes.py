@@ -0,0 +1,104 @@
+#------------------------------------------------------------------------------------------------------------------
+#   Verification of the compact storage dtypes (accuracy of the model with float32/int16 samples and features)
+#------------------------------------------------------------------------------------------------------------------
+import os
+import sys
+import json
+import argparse
+import tempfile
+
+import numpy as np
+from sklearn.model_selection import StratifiedKFold
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from online.linear_model import LinearModel
+from processing.convert_obj import CHANNELS
+from processing.feature_cache import recording_features
+from processing.features import FEATURE_SETS
+from processing.recording import Recording, load_windows, save_windows
+from training.export_model import train_model
+
+# Default recording (the one processed by processing/data_processing.py)
+DEFAULT_INPUT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'raw', 'luis_data_1.obj'))
+
+# Compared variants as (sample dtype, feature dtype); the first one is the reference
+VARIANTS = (('float64', 'float64'), ('float32', 'float64'), ('int16', 'float64'), ('float32', 'float32'), ('int16', 'float32'))
+
+# Function for getting the cross-validated predictions of the exported model (RFE + linear SVC, predicted
+# with LinearModel as online) for the given folds
+def cross_validate(x, y, splits, n_features=10, C=1.):
+    y_pred = np.empty(len(y))
+    for train, test in splits:
+        clf, arrays = train_model(x[train], y[train], n_features, C)
+        arrays.pop('version')
+        model = LinearModel(**arrays)
+        y_pred[test] = model.predict(x[test][:, model.selected])
+    return y_pred
+
+# Function for storing the windows with the given sample dtype and calculating their features with each
+# feature dtype, through the same functions as the acquisition and processing scripts (save_windows(),
+# Recording, recording_features()). Returns the decoded windows, the bytes of the stored samples and the
+# feature table of each feature dtype.
+def stored_variant(data, channels, sample_dtype, feature_dtypes, directory, feature_set='basic'):
+    path = os.path.join(directory, sample_dtype + '.rec')
+    save_windows(path, data, channels, dtype=sample_dtype)
+    windows = Recording(path).stack()
+    n_bytes = os.path.getsize(os.path.join(path, 'samples.bin'))
+    return windows, n_bytes, {d: recording_features(path, feature_set, dtype=d) for d in feature_dtypes}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Accuracy and size of the model data stored as float32 or int16 samples and float32 features')
+    parser.add_argument('inputs', nargs='*', default=[DEFAULT_INPUT], help='Window recordings (.obj or .rec, default: data/raw/luis_data_1.obj)')
+    parser.add_argument('--features', type=int, default=10, help='Number of features kept by RFE')
+    parser.add_argument('--C', type=float, default=1., help='Regularization parameter of the SVC')
+    parser.add_argument('--feature-set', choices=FEATURE_SETS, default='basic', help='Feature set')
+    parser.add_argument('--folds', type=int, default=5, help='Number of cross-validation folds')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the fold shuffling')
+    parser.add_argument('--output', help='JSON file for the results')
+    args = parser.parse_args()
+
+    data = []
+    for path in args.inputs:
+        data += load_windows(path)
+    n_channels = data[0][2].shape[1]
+    channels = CHANNELS.get(n_channels, ['x{}'.format(i) for i in range(n_channels)])
+    original = np.stack([np.asarray(w, dtype='float64') for c, i, w in data])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stored = {}
+        for sample_dtype in dict.fromkeys(v[0] for v in VARIANTS):
+            stored[sample_dtype] = stored_variant(data, channels, sample_dtype, set(v[1] for v in VARIANTS if v[0] == sample_dtype),
+                                                  tmp, args.feature_set)
+
+    reference = stored[VARIANTS[0][0]][2][VARIANTS[0][1]]
+    y = reference[:, 0]
+    splits = list(StratifiedKFold(n_splits=args.folds, shuffle=True, random_state=args.seed).split(reference, y))
+    results = []
+    print("{:<9} {:<9} {:>13} {:>14} {:>12} {:>12} {:>10} {:>8} {:>10}".format('samples', 'features', 'sample bytes',
+          'feature bytes', 'sample err', 'feature dev', 'accuracy', 'delta', 'agreement'))
+    for sample_dtype, feature_dtype in VARIANTS:
+        windows, sample_bytes, tables = stored[sample_dtype]
+        table = tables[feature_dtype]
+        y_pred = cross_validate(table[:, 1:], y, splits, args.features, args.C)
+        if not results:
+            reference_pred = y_pred
+        with np.errstate(invalid='ignore'):
+            deviation = np.abs(table[:, 1:] - reference[:, 1:]) / np.maximum(1., np.abs(reference[:, 1:]))
+
+        result = {'sample_dtype': sample_dtype, 'feature_dtype': feature_dtype, 'sample_bytes': sample_bytes,
+                  'feature_bytes': table[:, 1:].nbytes, 'sample_error': float(np.max(np.abs(windows - original))),
+                  'feature_deviation': float(np.nanmax(deviation)), 'accuracy': float(np.mean(y_pred == y)),
+                  'agreement': float(np.mean(y_pred == reference_pred))}
+        result['accuracy_delta'] = result['accuracy'] - (results[0]['accuracy'] if results else result['accuracy'])
+        results.append(result)
+        print("{:<9} {:<9} {:>13} {:>14} {:>12.2e} {:>12.2e} {:>10.4f} {:>+8.4f} {:>10.4f}".format(sample_dtype, feature_dtype,
+              result['sample_bytes'], result['feature_bytes'], result['sample_error'], result['feature_deviation'],
+              result['accuracy'], result['accuracy_delta'], result['agreement']))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+#------------------------------------------------------------------------------------------------------------------
+#   End of file
+#------------------------------------------------------------------------------------------------------------------
\ No newline at end of file